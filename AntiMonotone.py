@@ -7,32 +7,14 @@ class AntiMonotone:
     @staticmethod
     def generate_candidates(k_freq_itemsets, constraint, items):
         """
-        Returns set of candidates with k + 1 nodes using set of candidates with k nodes and also returns support data which contains the parent child relationship.
-        :param k_freq_itemsets: List of frequent itemsets of size k
+        Returns list of candidates with k + 1 nodes using the frequent itemsets with k nodes.
+        :param k_freq_itemsets: ItemsetArray or ItemsetTrie of the frequent itemsets of size k
         :param constraint: function which returns boolean value
         :param items: not used by definition of antimonotone but used by loosely antimonotone definition
-        :return: List of candidates of size k+1, dictionary of support data with child -> parent mapping
+        :return: List of candidates of size k+1
         """
-        candidates = set()
-        support_data = {}
-        for a in k_freq_itemsets:
-            for b in k_freq_itemsets:
-                k = len(a)
-                union = tuple(sorted(set(a).union(set(b))))
-                if len(union) == k + 1 and constraint(list(union)):
-                    if union not in candidates:
-                        parents = LevelwiseApriori.find_subsets(list(union), k)
-                        if isSubSet(parents, k_freq_itemsets):
-                            candidates.add(union)
-                            if union not in support_data:
-                                support_data[tuple(union)] = parents
-        # returning set of candidates with k + 1 nodes
-        return list(candidates), support_data
-
-
-def isSubSet(parents, k_freq_itemsets):
-    for tup in parents:
-        if tuple(sorted(tup)) not in k_freq_itemsets:
-            return False
-    return True
-
+        # Apriori-gen join: the sorted itemsets which share their first k - 1 items are joined, which generates every
+        # union of k + 1 items exactly once, and the unions with a subset of k items which is not frequent are dropped
+        unions = k_freq_itemsets.join_candidates()
+        # the constraint is evaluated once per candidate whose parents are all frequent
+        return LevelwiseApriori.filter_candidates(unions, constraint)
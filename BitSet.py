@@ -0,0 +1,57 @@
+import itertools
+import sys
+import numpy as np
+
+__author__ = 'adb'
+
+
+if sys.version_info >= (3, 10):
+    # counts the set bits in C, without building the binary string
+    popcount = int.bit_count
+else:
+    def popcount(x):
+        """
+        Returns the number of set bits in x
+        :param x: int
+        :return: int
+        """
+        return bin(x).count('1')
+
+
+def iter_bits(x):
+    """
+    Yields the positions of the set bits in x in increasing order
+    :param x: int
+    :return: generator of int
+    """
+    while x:
+        low = x & -x
+        yield low.bit_length() - 1
+        x ^= low
+
+
+def to_bit_array(bits, n):
+    """
+    Returns the n lowest bits of the bitset bits as an array of 0/1
+    :param bits: int
+    :param n: int - number of bits
+    :return: numpy array of uint8
+    """
+    return np.unpackbits(np.frombuffer(bits.to_bytes((n + 7) // 8, 'little'), dtype=np.uint8),
+                         bitorder='little')[:n]
+
+
+def from_bit_rows(rows):
+    """
+    Returns the rows of a little endian bit array as bitsets, the inverse of to_bit_array over packed rows
+    :param rows: numpy array of uint8 of shape (number of bitsets, number of bytes)
+    :return: list of int
+    """
+    num_of_bytes = rows.shape[1]
+    if num_of_bytes <= 8:
+        # the rows fit a machine word, whose conversion to int does not go through the interpreter
+        words = np.zeros((len(rows), 8), dtype=np.uint8)
+        words[:, :num_of_bytes] = rows
+        return words.view('<u8').ravel().tolist()
+    rows = np.ascontiguousarray(rows).view(np.dtype((np.void, num_of_bytes))).ravel()
+    return list(map(int.from_bytes, rows.tolist(), itertools.repeat('little')))
@@ -0,0 +1,127 @@
+import itertools
+from collections import Counter
+from LevelwiseApriori import LevelwiseApriori
+
+__author__ = 'adb'
+
+
+class CliqueAntiMonotone:
+    """
+    Candidate generation of the levelwise algorithm for anti-monotone constraints on the graph of the pairs of items
+    which satisfy the constraint
+
+    Every pair of items of a frequent itemset is frequent, so the frequent itemsets are cliques of this pair graph,
+    which is the first level of the levelwise search. The pair graph is held as neighbour sets and split into its
+    connected components, and the itemsets are extended component by component. Like in Bron-Kerbosch, every itemset
+    has a candidate set, the common neighbours of its items larger than its last item, which is the candidate set of
+    its parent intersected with the neighbours of its last item: an itemset is only extended by the items of its
+    candidate set, so every clique of k + 1 items is generated once. Before a level is extended, the items which are in
+    less than k itemsets of the level and then the items with less than k neighbours (the k-core of the pair graph) are
+    removed from the graph, as they cannot be in a candidate of k + 1 items, and the components left with less than
+    k + 1 items are skipped.
+
+    The generated candidates are the ones of AntiMonotone.generate_candidates. The pair graph and the candidate sets
+    are kept between the levels, so an instance is used for one levelwise search at a time.
+    """
+
+    def __init__(self):
+        # neighbours of every item of the k-core of the pair graph, set from the first level
+        self.neighbours = {}
+        # component of every item of the pair graph and number of items of every component left in the k-core
+        self.component_of = {}
+        self.component_sizes = []
+        # candidate set of every itemset of the last level
+        self.candidate_sets = {}
+
+    def generate_candidates(self, k_freq_itemsets, constraint, items):
+        """
+        Returns list of candidates with k + 1 nodes using the frequent itemsets with k nodes.
+        :param k_freq_itemsets: ItemsetArray or ItemsetTrie of the frequent itemsets of size k
+        :param constraint: function which returns boolean value
+        :param items: list of singleton items in the dataset, the node ids
+        :return: List of candidates of size k+1
+        """
+        k = k_freq_itemsets.size
+        itemsets = list(k_freq_itemsets)
+        if k == 2:
+            self.__build_pair_graph(itemsets)
+        # an item of a candidate of k + 1 items is in k of its subsets and adjacent to its k other items
+        self.__prune_core(Counter(itertools.chain.from_iterable(itemsets)), k)
+        by_component = [[] for _ in self.component_sizes]
+        for itemset in itemsets:
+            if all(item in self.neighbours for item in itemset):
+                by_component[self.component_of[itemset[0]]].append(itemset)
+        level = set(itemsets)
+        candidate_sets = {}
+        unions = []
+        for component, component_itemsets in enumerate(by_component):
+            if self.component_sizes[component] <= k:
+                continue
+            for itemset in component_itemsets:
+                last = itemset[-1]
+                neighbours = self.neighbours[last]
+                if k == 2:
+                    parent_candidates = self.neighbours[itemset[0]]
+                else:
+                    parent_candidates = self.candidate_sets[itemset[:-1]]
+                candidate_set = {item for item in parent_candidates & neighbours if item > last}
+                if candidate_set:
+                    candidate_sets[itemset] = candidate_set
+                # the extended itemset is the subset without the new item, the others are checked before the constraint
+                for item in sorted(candidate_set):
+                    union = itemset + (item,)
+                    if all(union[:i] + union[i + 1:] in level for i in range(k)):
+                        unions.append(union)
+        self.candidate_sets = candidate_sets
+        # the constraint is evaluated once per candidate whose parents are all frequent
+        return LevelwiseApriori.filter_candidates(unions, constraint)
+
+    def __build_pair_graph(self, pairs):
+        """
+        Sets the neighbour sets of the pair graph and its connected components
+        :param pairs: list of tuples of two items
+        :return: None
+        """
+        self.neighbours = {}
+        for u, v in pairs:
+            self.neighbours.setdefault(u, set()).add(v)
+            self.neighbours.setdefault(v, set()).add(u)
+        self.component_of = {}
+        self.component_sizes = []
+        for root in self.neighbours:
+            if root in self.component_of:
+                continue
+            component = len(self.component_sizes)
+            self.component_of[root] = component
+            stack = [root]
+            size = 0
+            while stack:
+                item = stack.pop()
+                size += 1
+                for neighbour in self.neighbours[item]:
+                    if neighbour not in self.component_of:
+                        self.component_of[neighbour] = component
+                        stack.append(neighbour)
+            self.component_sizes.append(size)
+
+    def __prune_core(self, counts, k):
+        """
+        Removes the items of the pair graph which are in less than k itemsets, then the items with less than k
+        neighbours until there are none
+        :param counts: Counter {item: number of itemsets of the level which contain it}
+        :param k: int - smallest number of itemsets and of neighbours of the items left
+        :return: None
+        """
+        removed = {item for item, neighbours in self.neighbours.items() if counts[item] < k or len(neighbours) < k}
+        stack = list(removed)
+        while stack:
+            item = stack.pop()
+            self.component_sizes[self.component_of[item]] -= 1
+            for neighbour in self.neighbours.pop(item):
+                if neighbour in removed:
+                    continue
+                neighbours = self.neighbours[neighbour]
+                neighbours.discard(item)
+                if len(neighbours) < k:
+                    removed.add(neighbour)
+                    stack.append(neighbour)
@@ -0,0 +1,280 @@
+import numpy as np
+
+__author__ = 'adb'
+
+
+class DivergenceConstraint:
+    """
+    Constraint of the levelwise search which holds for the node sets whose subgraph divergence is at most a threshold
+
+    It can be called on a single node set like the constraint functions, and evaluate_many checks a whole level of node
+    sets at once with Ensemble.compute_sd_batch. evaluate_many keeps the partition of the timestamps (by induced
+    subgraph) of the node sets of the last level which satisfied the constraint, the frontier of the levelwise search,
+    so that a node set of the next level which extends one of them by a single node is evaluated by refining its
+    partition with Ensemble.extend_sd_batch.
+
+    The partition of a parent also bounds the divergence of its children. The subgraph divergence is C(k, 2) - H where
+    H = -sum(p * log2(p)) over the induced subgraphs. Adding a node to a parent of size k splits every class of c
+    timestamps of the parent, whose static graphs take d distinct values, into at most min(2^k, d) classes, so
+    H(child) <= H(parent) + sum(c / T * log2(min(2^k, d))) over the classes of the parent. Children whose divergence
+    bound exceeds the threshold are rejected without being evaluated, and can_extend tells the levelwise search when no
+    child of the frontier can satisfy the constraint.
+
+    With num_of_samples, the remaining candidates are first screened with Ensemble.estimate_ssd_batch: the candidates
+    whose confidence interval is on one side of the threshold are accepted or rejected from the estimate and only the
+    candidates whose interval contains the threshold are evaluated exactly. The intervals hold for any distribution of
+    the induced subgraphs, so a screened candidate is misclassified with probability at most 1 - confidence, and the
+    intervals of small samples are too wide to decide any candidate. Node sets accepted from their
+    estimate have no partition, so their children are evaluated from scratch and the levelwise search is not stopped
+    by can_extend after them.
+
+    When the ensemble has at least CACHE_MIN_SNAPSHOTS distinct static graphs (below, evaluating a candidate is
+    cheaper than caching it), the induced subgraph counts of the evaluated node sets are added to the cache of the
+    ensemble (see Ensemble.get_subgraph_counts_of_ids), and the node sets whose cached counts violate the constraint,
+    e.g. counted by the mining of another threshold, are rejected without being evaluated. The node sets whose cached
+    counts satisfy the constraint are evaluated anyway, as their partition is needed to evaluate their children.
+    """
+
+    # tolerance of the bounds for the floating point error of the divergences
+    EPSILON = 1e-9
+    # number of distinct static graphs from which evaluating a candidate costs more than caching its counts
+    CACHE_MIN_SNAPSHOTS = 128
+
+    def __init__(self, ensemble, threshold, scaled=True, num_of_samples=None, confidence=0.999, seed=None):
+        """
+        :param ensemble: Ensemble
+        :param threshold: float - phi for the subgraph divergence, sigma for the scaled subgraph divergence
+        :param scaled: boolean - True to bound the scaled subgraph divergence
+        :param num_of_samples: int - number of sampled timestamps to screen the candidates, None to evaluate them all
+                               exactly
+        :param confidence: float - confidence of the intervals of the sampled estimates
+        :param seed: int - seed of the samples
+        """
+        self.ensemble = ensemble
+        self.threshold = threshold
+        self.scaled = scaled
+        self.num_of_samples = num_of_samples
+        self.confidence = confidence
+        self.random = np.random.default_rng(seed)
+        # node sets of the frontier -> row of their labels in frontier_labels
+        self.frontier = {}
+        self.frontier_labels = None
+        # upper bound on the entropy of the children of every node set of the frontier
+        self.frontier_bounds = None
+        # false if node sets of the last level were accepted from their estimate
+        self.frontier_complete = True
+        self.num_of_evaluated = 0
+        self.num_of_pruned_by_bound = 0
+        self.num_of_pruned_by_evaluation = 0
+        self.num_of_pruned_levels = 0
+        self.num_of_accepted_by_estimate = 0
+        self.num_of_pruned_by_estimate = 0
+        self.num_of_pruned_by_cache = 0
+
+    def __call__(self, ids):
+        """
+        Returns true if the node set satisfies the constraint
+        :param ids: list of node ids
+        :return: boolean
+        """
+        if self.scaled:
+            return self.ensemble.compute_scaled_subgraph_divergence_of_ids(ids) <= self.threshold
+        return self.ensemble.compute_subgraph_divergence_of_ids(ids) <= self.threshold
+
+    def get_stats(self):
+        """
+        Returns the number of candidates evaluated exactly by evaluate_many, the number of candidates rejected by the
+        entropy bound, by their exact divergence and by their estimate, the number of candidates accepted by their
+        estimate, the number of levels which can_extend found empty and the number of candidates rejected by their
+        induced subgraph counts cached by the ensemble
+        :return: dict
+        """
+        return {'evaluated': self.num_of_evaluated, 'pruned_by_bound': self.num_of_pruned_by_bound,
+                'pruned_by_evaluation': self.num_of_pruned_by_evaluation, 'pruned_levels': self.num_of_pruned_levels,
+                'accepted_by_estimate': self.num_of_accepted_by_estimate,
+                'pruned_by_estimate': self.num_of_pruned_by_estimate, 'pruned_by_cache': self.num_of_pruned_by_cache}
+
+    def can_extend(self):
+        """
+        Returns false if no node set which extends a node set of the frontier by one node satisfies the constraint
+        :return: boolean
+        """
+        if not self.frontier or not self.frontier_complete:
+            return True
+        size = len(next(iter(self.frontier))) + 1
+        if self.__violates(size, self.frontier_bounds.max()):
+            self.num_of_pruned_levels += 1
+            return False
+        return True
+
+    def evaluate_many(self, itemsets, evaluated=None):
+        """
+        Returns for every node set whether it satisfies the constraint
+
+        The node sets which satisfy the constraint become the frontier used to evaluate the next level.
+        :param itemsets: list of tuples of node ids
+        :param evaluated: dict - if given, the divergence (scaled or not, like the threshold) of every node set
+                          evaluated exactly is added to it
+        :return: list of boolean
+        """
+        satisfied = [False] * len(itemsets)
+        use_cache = len(self.ensemble.get_unique_snapshots()[0]) >= DivergenceConstraint.CACHE_MIN_SNAPSHOTS
+        by_size = {}
+        for k, itemset in enumerate(itemsets):
+            by_size.setdefault(len(itemset), []).append(k)
+        for size, positions in by_size.items():
+            # every node set is evaluated from a parent in the frontier if it has one, and rejected if the entropy
+            # bound of one of its parents is too small
+            extended = []
+            parents = []
+            items = []
+            computed = []
+            for k in positions:
+                itemset = itemsets[k]
+                counts = self.ensemble.get_subgraph_counts_of_ids(itemset, compute=False) if use_cache else None
+                if counts is not None and not self.__satisfies(size, counts):
+                    self.num_of_pruned_by_cache += 1
+                    continue
+                parent_row = None
+                bound = None
+                for j in range(size - 1, -1, -1):
+                    row = self.frontier.get(itemset[:j] + itemset[j + 1:])
+                    if row is not None:
+                        if parent_row is None:
+                            parent_row = row
+                            item = itemset[j]
+                        if bound is None or self.frontier_bounds[row] < bound:
+                            bound = self.frontier_bounds[row]
+                if parent_row is None:
+                    computed.append(k)
+                elif self.__violates(size, bound):
+                    self.num_of_pruned_by_bound += 1
+                else:
+                    extended.append(k)
+                    parents.append(parent_row)
+                    items.append(item)
+            accepted = []
+            if self.num_of_samples:
+                extended, parents, items, accepted = self.__screen(itemsets, size, extended, parents, items)
+                computed, no_parents, no_items, computed_accepted = self.__screen(itemsets, size, computed)
+                accepted += computed_accepted
+                for k in accepted:
+                    satisfied[k] = True
+            divergences = []
+            labels = []
+            if extended:
+                parent_rows = np.array(parents, dtype=np.int64)
+                parent_ids = np.array([tuple(i for i in itemsets[k] if i != a) for k, a in zip(extended, items)],
+                                      dtype=np.int64).reshape(len(extended), size - 1)
+                extended_divergences, extended_labels = self.ensemble.extend_sd_batch(
+                    self.frontier_labels[parent_rows], parent_ids, items, return_labels=True)
+                divergences.append(extended_divergences)
+                labels.append(extended_labels)
+            if computed:
+                candidates = np.array([itemsets[k] for k in computed], dtype=np.int64).reshape(len(computed), size)
+                computed_divergences, computed_labels = self.ensemble.compute_sd_batch(candidates, return_labels=True)
+                divergences.append(computed_divergences)
+                labels.append(computed_labels)
+            order = extended + computed
+            self.num_of_evaluated += len(order)
+            self.frontier_complete = not accepted
+            if not order:
+                self.frontier = {}
+                self.frontier_labels = self.frontier_bounds = None
+                continue
+            divergences = np.concatenate(divergences)
+            labels = np.concatenate(labels)
+            if use_cache:
+                for k, counts in zip(order, self.ensemble.get_subgraph_counts_of_labels(labels)):
+                    self.ensemble.put_subgraph_counts_of_ids(itemsets[k], counts)
+            if self.scaled:
+                divergences /= self.ensemble.compute_combinations(size, 2)
+            if evaluated is not None:
+                evaluated.update(zip([itemsets[k] for k in order], divergences.tolist()))
+            passed = np.flatnonzero(divergences <= self.threshold)
+            self.num_of_pruned_by_evaluation += len(order) - len(passed)
+            for r in passed.tolist():
+                satisfied[order[r]] = True
+            self.frontier = dict((itemsets[order[r]], row) for row, r in enumerate(passed.tolist()))
+            self.frontier_labels = labels[passed]
+            self.frontier_bounds = self.__entropy_bounds(self.frontier_labels, size)
+        return satisfied
+
+    def __screen(self, itemsets, size, positions, parents=(), items=()):
+        """
+        Accepts or rejects the node sets itemsets[k] for k in positions whose estimated confidence interval is on one
+        side of the threshold
+        :param itemsets: list of tuples of node ids
+        :param size: int - number of nodes of the node sets
+        :param positions: list of int - positions of the node sets to screen
+        :param parents: list of int - frontier row of the parent of every node set
+        :param items: list of int - node added to the parent of every node set
+        :return: the positions, parents and items of the undecided node sets and the positions of the accepted ones
+        """
+        if not positions:
+            return positions, parents, items, []
+        candidates = np.array([itemsets[k] for k in positions], dtype=np.int64).reshape(len(positions), size)
+        estimates, lower, upper = self.ensemble.estimate_ssd_batch(candidates, self.num_of_samples, self.confidence,
+                                                                   self.random)
+        if not self.scaled:
+            combinations = self.ensemble.compute_combinations(size, 2)
+            lower, upper = lower * combinations, upper * combinations
+        accepted = upper <= self.threshold
+        rejected = lower > self.threshold
+        self.num_of_accepted_by_estimate += int(accepted.sum())
+        self.num_of_pruned_by_estimate += int(rejected.sum())
+        undecided = np.flatnonzero(~(accepted | rejected)).tolist()
+        return ([positions[r] for r in undecided], [parents[r] for r in undecided] if parents else parents,
+                [items[r] for r in undecided] if items else items, [positions[r] for r in np.flatnonzero(accepted)])
+
+    def __satisfies(self, size, counts):
+        """
+        Returns false if a node set of the given size with the given induced subgraph counts violates the constraint
+
+        The divergence is summed with numpy rather than in the order of compute_divergence_from_counts, so only the
+        node sets whose divergence exceeds the threshold by more than EPSILON are rejected.
+        :param size: int - number of nodes
+        :param counts: tuple of int - number of timestamps of every induced subgraph ordered by first timestamp
+        :return: boolean
+        """
+        probabilities = np.array(counts, dtype=float) / self.ensemble.get_num_of_timestamps()
+        divergence = self.ensemble.compute_combinations(size, 2) + np.dot(probabilities, np.log2(probabilities))
+        if self.scaled:
+            divergence /= self.ensemble.compute_combinations(size, 2)
+        return divergence <= self.threshold + DivergenceConstraint.EPSILON
+
+    def __violates(self, size, entropy_bound):
+        """
+        Returns true if a node set of the given size whose entropy is at most entropy_bound violates the constraint
+        :param size: int - number of nodes
+        :param entropy_bound: float
+        :return: boolean
+        """
+        combinations = self.ensemble.compute_combinations(size, 2)
+        divergence_bound = combinations - entropy_bound
+        if self.scaled:
+            divergence_bound /= combinations
+        return divergence_bound > self.threshold + DivergenceConstraint.EPSILON
+
+    def __entropy_bounds(self, labels, size):
+        """
+        Returns the upper bound on the entropy of the children of the node sets with the given labels
+        :param labels: 2-D array of labels of the representatives of the distinct static graphs (see
+                       Ensemble.get_unique_snapshots), one row per node set
+        :param size: int - number of nodes of the node sets
+        :return: numpy array of float
+        """
+        num_of_sets, num_of_unique = labels.shape
+        num_of_timestamps = self.ensemble.get_num_of_timestamps()
+        if not num_of_sets or not num_of_unique:
+            return np.zeros(num_of_sets)
+        indices, multiplicities = self.ensemble.get_unique_snapshots()
+        # a class of c timestamps with d distinct static graphs is split by a new node into at most min(2^k, d)
+        # classes, which adds at most c / T * min(k, log2(d)) to the entropy
+        offsets = (np.arange(num_of_sets, dtype=np.int64)[:, None] * num_of_unique + labels).ravel()
+        distinct = np.bincount(offsets, minlength=num_of_sets * num_of_unique).reshape(num_of_sets, num_of_unique)
+        counts = np.bincount(offsets, weights=np.tile(multiplicities, num_of_sets),
+                             minlength=num_of_sets * num_of_unique).reshape(num_of_sets, num_of_unique)
+        p = counts / num_of_timestamps
+        log_p = np.log2(np.where(distinct > 0, p, 1.0))
+        return (p * (np.minimum(size, np.log2(np.maximum(distinct, 1))) - log_p)).sum(axis=1)
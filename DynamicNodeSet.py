@@ -0,0 +1,170 @@
+import math
+import numpy as np
+from BitSet import iter_bits
+
+__author__ = 'adb'
+
+MASK_64 = (1 << 64) - 1
+
+
+class DynamicNodeSet:
+    """
+    A set of nodes of an ensemble whose subgraph divergence is kept up to date while nodes are added and removed
+
+    The subgraph induced at every distinct non empty static graph (see Ensemble.get_unique_snapshots) is identified by
+    a 64 bit Zobrist hash: the XOR of the keys of its edges, where every node pair has a fixed pseudo random key. Adding
+    or removing a node toggles the keys of its edges to the other nodes of the set at the distinct static graphs at
+    which they exist, so an update costs time proportional to the number of (edge, distinct static graph) occurrences
+    of the node. The number of timestamps of every hash and the sum of
+    count * log2(count) over the hashes are updated along, and the divergence is computed from them in O(1).
+
+    Note: distinct subgraphs of the same node set get the same hash with probability about 2^-64. The divergence is
+    equal to Ensemble.compute_subgraph_divergence up to floating point rounding.
+    """
+
+    def __init__(self, ensemble, nodes=()):
+        """
+        :param ensemble: Ensemble (or a view of it)
+        :param nodes: list of nodes of the ensemble
+        """
+        self.ensemble = ensemble
+        indices, multiplicities = ensemble.get_unique_snapshots()
+        self.unique_mask = ensemble.get_unique_mask()
+        # number of timestamps of every distinct static graph
+        self.multiplicities = dict(zip(indices.tolist(), multiplicities.tolist()))
+        self.num_of_nonempty = int(multiplicities.sum())
+        self.num_of_timestamps = ensemble.get_num_of_timestamps()
+        self.ids = set()
+        # hash of the induced subgraph at every timestamp, the hash of the empty subgraph is 0
+        self.hashes = [0] * len(ensemble.timestamps)
+        # number of non empty timestamps for every hash and sum of count * log2(count) over the hashes
+        self.counts = {0: self.num_of_nonempty} if self.num_of_nonempty else {}
+        self.sum_count_log_count = DynamicNodeSet.count_log_count(self.num_of_nonempty)
+        for v in nodes:
+            self.add(v)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, v):
+        return v in self.ensemble.node_ids and self.ensemble.node_ids[v] in self.ids
+
+    def nodes(self):
+        """
+        Returns the nodes in the set
+        :return: list of nodes
+        """
+        return self.ensemble.get_node_labels(sorted(self.ids))
+
+    def add(self, v):
+        """
+        Add the node v to the set
+        :param v: node of the ensemble
+        :return: None
+        """
+        i = self.ensemble.get_node_id(v)
+        if i not in self.ids:
+            self.__toggle_edges(i)
+            self.ids.add(i)
+
+    def remove(self, v):
+        """
+        Remove the node v from the set
+        :param v: node of the ensemble
+        :return: None
+        """
+        i = self.ensemble.get_node_id(v)
+        if i in self.ids:
+            self.ids.remove(i)
+            self.__toggle_edges(i)
+
+    def compute_subgraph_divergence(self):
+        """
+        Returns the subgraph divergence of the set
+        :return: float
+        """
+        n = self.num_of_timestamps
+        entropy_sum = (self.sum_count_log_count - self.num_of_nonempty * math.log2(n)) / n
+        return self.ensemble.compute_combinations(len(self.ids), 2) + entropy_sum
+
+    def compute_scaled_subgraph_divergence(self):
+        """
+        Returns the scaled subgraph divergence of the set
+        :return: float (value <= 1)
+        """
+        return self.compute_subgraph_divergence() / self.ensemble.compute_combinations(len(self.ids), 2)
+
+    def __toggle_edges(self, i):
+        """
+        Toggles the edges between the node with id i and the other nodes of the set in the hashes
+        :param i: int - node id
+        :return: None
+        """
+        for j, bits in self.ensemble.adj[i].items():
+            bits &= self.unique_mask
+            if bits and j in self.ids:
+                key = DynamicNodeSet.pair_key(i, j)
+                for t in iter_bits(bits):
+                    old = self.hashes[t]
+                    new = old ^ key
+                    self.hashes[t] = new
+                    self.__move_timestamps(old, new, self.multiplicities[t])
+
+    def __move_timestamps(self, old, new, multiplicity):
+        """
+        Moves the timestamps of a distinct static graph from the class of the hash old to the class of the hash new
+        :param old: int - hash
+        :param new: int - hash
+        :param multiplicity: int - number of timestamps of the static graph
+        :return: None
+        """
+        count = self.counts[old]
+        self.sum_count_log_count += (DynamicNodeSet.count_log_count(count - multiplicity) -
+                                     DynamicNodeSet.count_log_count(count))
+        if count == multiplicity:
+            del self.counts[old]
+        else:
+            self.counts[old] = count - multiplicity
+        count = self.counts.get(new, 0)
+        self.sum_count_log_count += (DynamicNodeSet.count_log_count(count + multiplicity) -
+                                     DynamicNodeSet.count_log_count(count))
+        self.counts[new] = count + multiplicity
+
+    @staticmethod
+    def count_log_count(count):
+        """
+        Returns count * log2(count), 0 for count 0
+        :param count: int
+        :return: float
+        """
+        return count * math.log2(count) if count else 0.0
+
+    @staticmethod
+    def pair_key(i, j):
+        """
+        Returns the 64 bit Zobrist key of the pair of node ids (i, j), the splitmix64 hash of the pair
+        :param i: int - node id
+        :param j: int - node id
+        :return: int
+        """
+        if i > j:
+            i, j = j, i
+        z = ((i << 32 | j) + 0x9E3779B97F4A7C15) & MASK_64
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK_64
+        return z ^ (z >> 31)
+
+    @staticmethod
+    def pair_keys(first, second):
+        """
+        Returns the Zobrist keys of the pairs of node ids (first[k], second[k]), same as pair_key
+        :param first: array of int - node ids
+        :param second: array of int - node ids
+        :return: numpy array of uint64
+        """
+        first = np.asarray(first, dtype=np.uint64)
+        second = np.asarray(second, dtype=np.uint64)
+        z = (np.minimum(first, second) << np.uint64(32) | np.maximum(first, second)) + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
@@ -1,31 +1,109 @@
+import bisect
+import concurrent.futures
+import copy
+import datetime
+import hashlib
+import itertools
 import math
+import operator
+import os
+import shutil
+import weakref
 import networkx as nx
+import numpy as np
+from numpy.lib.format import open_memmap
 from LevelwiseApriori import LevelwiseApriori
 from AntiMonotone import AntiMonotone
+from CliqueAntiMonotone import CliqueAntiMonotone
 from LooselyAntiMonotone import LooselyAntiMonotone
+from MappedAdjacency import MappedAdjacency
+from BitSet import popcount, iter_bits, to_bit_array, from_bit_rows
+from WindowedDivergence import WindowedDivergence
+from DivergenceConstraint import DivergenceConstraint
+from DynamicNodeSet import DynamicNodeSet
+from LRUCache import LRUCache
+from SubgraphCountStore import SubgraphCountStore
+
+try:
+    import scipy.sparse as scipy_sparse
+except ImportError:
+    scipy_sparse = None
 
 __author__ = 'adb'
 
 
 class Ensemble:
     """
-    An ensemble is dictionary of Undirected Graph where key is timestamp and
-    value is networkx object of the static graph at that timestamp
+    An ensemble is a collection of undirected static graphs indexed by timestamp.
+
+    Nodes are interned to dense integer ids 0..N-1 in the order in which they are added to the ensemble and the ensemble
+    is stored as a pair-by-timestamp bit matrix: for every pair of node ids (i, j) adj[i][j] is a python int whose k-th
+    bit is set if the edge is present in the static graph at the k-th timestamp. Timestamps are numbered in the order in
+    which they are added to the ensemble. Mining works on node ids, the node labels are only used for input and output.
+
+    The timestamps are also kept in chronological order of their parsed values (see parse_timestamp). slice and window
+    return views of the ensemble restricted to a range of timestamps; a view shares the node registry and the bit
+    matrix with the ensemble it was sliced from and only holds the bitset of the timestamps it covers.
     """
 
+    # estimated number of class splits above which induced subgraphs are counted with numpy rather than by refinement
+    BULK_SIGNATURE_WORK = 4096
+    # memory cap of the cache of the induced subgraph counts of every ensemble and view
+    SUBGRAPH_COUNT_CACHE_BYTES = 64 << 20
+
     def __init__(self, ensemble=None):
-        # empty graph at 0 timestamp
+        # timestamps in insertion order, bit i of every edge bitset refers to timestamps[i]
+        self.timestamps = []
+        self.timestamp_index = {}
+        # sort keys of the parsed timestamps in chronological order and the index of the timestamp for each key
+        self.sorted_timestamp_keys = []
+        self.sorted_timestamp_indices = []
+        # views restrict the ensemble to the timestamps in time_mask, base is the ensemble which owns the storage
+        self.time_mask = None
+        self.base = self
+        # node registry, node_labels[i] is the node with id i and node_attr[i] are its attributes
+        self.node_ids = {}
+        self.node_labels = []
+        self.node_attr = []
+        # adj[i][j] == adj[j][i] == bitset of timestamps at which the edge between the nodes with ids i and j exists
+        self.adj = []
+        self.time_edge_counts = []
+        # Zobrist hash of the edge set of every timestamp, the XOR of the keys of its edges (DynamicNodeSet.pair_key)
+        self.time_hashes = []
+        self.num_of_edges = 0
+        # bitset of timestamps which have at least one edge
+        self.nonempty_mask = 0
+        # distinct non empty static graphs of the ensemble, see get_unique_snapshots
+        self.unique_snapshots = None
+        # node ids -> number of timestamps of every induced subgraph for recently evaluated node sets, cleared when
+        # edges or timestamps are added (subgraph_counts_version)
+        self.subgraph_counts = LRUCache(Ensemble.SUBGRAPH_COUNT_CACHE_BYTES)
+        self.subgraph_counts_version = None
+        # persistent store of induced subgraph counts shared with other runs, see use_store
+        self.store = None
+        self.content_hash = None
+        # pool of processes of the ensemble and its views which count the induced subgraphs with num_of_workers, see
+        # use_process_pool, and its finalizer if the ensemble created it
+        self.process_pool = None
+        self.process_pool_finalizer = None
+        # candidates pruned by the last UC mining, see DivergenceConstraint.get_stats
+        self.pruning_stats = {}
         if ensemble:
-            self.time_graph_dict = ensemble
-        else:
-            self.time_graph_dict = dict()
+            for t, G in ensemble.items():
+                self.add_graph(t)
+                for v, attr in G.nodes(data=True):
+                    self.add_node(v, **attr)
+                for v1, v2 in G.edges():
+                    self.add_edge(t, v1, v2)
 
     def __len__(self):
         """
         Returns number of static graphs in the ensemble
         :return: int
         """
-        return len(self.time_graph_dict)
+        if self.time_mask is None:
+            return len(self.timestamps)
+        return popcount(self.time_mask)
 
     def __str__(self):
         """
@@ -43,11 +121,13 @@ class Ensemble:
 
     def get_static_graph_at_timestamp(self, t):
         """
-        Returns the reference to networkx object at timestamp t
+        Returns a networkx object of the static graph at timestamp t
+
+        Note: the graph is built from the bit matrix, changes to it are not reflected in the ensemble
         :return: networkx object
         """
-        if t in self.get_all_timestamps():
-            return self.time_graph_dict[t]
+        if t in self.timestamp_index and self.get_time_mask() >> self.timestamp_index[t] & 1:
+            return self.__build_static_graph(self.timestamp_index[t])
         else:
             return None
 
@@ -56,24 +136,110 @@ class Ensemble:
         Returns the list of timestamps in the ensemble
         :return: list
         """
-        return self.time_graph_dict.keys()
+        if self.time_mask is None:
+            return list(self.timestamps)
+        return [self.timestamps[i] for i in iter_bits(self.time_mask)]
+
+    def get_sorted_timestamps(self):
+        """
+        Returns the list of timestamps in the ensemble in chronological order
+        :return: list
+        """
+        mask = self.get_time_mask()
+        return [self.timestamps[i] for i in self.sorted_timestamp_indices if mask >> i & 1]
+
+    def get_time_mask(self):
+        """
+        Returns the bitset of the timestamps covered by the ensemble
+        :return: int
+        """
+        if self.time_mask is None:
+            return (1 << len(self.timestamps)) - 1
+        return self.time_mask
+
+    def get_nonempty_mask(self):
+        """
+        Returns the bitset of the timestamps covered by the ensemble whose static graph has at least one edge
+        :return: int
+        """
+        return self.base.nonempty_mask & self.get_time_mask()
+
+    def get_unique_snapshots(self):
+        """
+        Returns the distinct non empty static graphs of the ensemble with the number of timestamps of each
+
+        Static graphs are compared by the hash of their edge set (see time_hashes), every distinct static graph is
+        represented by its first timestamp. The subgraph divergences only depend on the number of timestamps of every
+        induced subgraph, so they are computed over the representatives weighted by their multiplicities.
+
+        Note: distinct static graphs get the same hash with probability about 2^-64.
+        :return: numpy array of int - indices of the representative timestamps in increasing order, numpy array of int -
+                 number of timestamps of every representative
+        """
+        return self.__find_unique_snapshots()[1:3]
+
+    def get_unique_mask(self):
+        """
+        Returns the bitset of the representative timestamps of the distinct non empty static graphs of the ensemble
+        :return: int
+        """
+        return self.__find_unique_snapshots()[0]
+
+    def __find_unique_snapshots(self):
+        """
+        Returns the representative timestamps of the distinct non empty static graphs, cached until the timestamps
+        covered by the ensemble or its edges change
+        :return: bitset of representatives, numpy array of indices of representatives, numpy array of multiplicities,
+                 dict {index of a representative: multiplicity} or None if all the non empty static graphs are distinct
+        """
+        key = (self.get_time_mask(), len(self.base.timestamps), self.base.num_of_edges)
+        if self.unique_snapshots is None or self.unique_snapshots[0] != key:
+            nonempty = np.flatnonzero(to_bit_array(self.get_nonempty_mask(), len(self.timestamps)))
+            time_hashes = np.array([self.time_hashes[i] for i in nonempty.tolist()], dtype=np.uint64)
+            unique, first, counts = np.unique(time_hashes, return_index=True, return_counts=True)
+            order = np.argsort(first)
+            indices = nonempty[first[order]]
+            counts = counts[order]
+            mask = int.from_bytes(np.packbits(np.isin(np.arange(len(self.timestamps)), indices),
+                                              bitorder='little').tobytes(), 'little')
+            weights = dict(zip(indices.tolist(), counts.tolist())) if len(indices) < len(nonempty) else None
+            self.unique_snapshots = (key, mask, indices, counts, weights)
+        return self.unique_snapshots[1:]
 
     def get_all_static_graphs(self):
         """
         Returns the list of networkx graph objects
         :return: list of networkx graph object
         """
-        return self.time_graph_dict.values()
+        return [self.__build_static_graph(i) for i in iter_bits(self.get_time_mask())]
+
+    def get_num_of_edges_in_static_graphs(self):
+        """
+        Returns the number of edges in the static graph at every timestamp
+        :return: list of int
+        """
+        return [self.time_edge_counts[i] for i in iter_bits(self.get_time_mask())]
+
+    def __build_static_graph(self, i):
+        """
+        Returns networkx object of the static graph at the i-th timestamp
+
+        Note: only the nodes with an edge at the timestamp are added to the graph
+        :param i: int - index of the timestamp
+        :return: networkx object
+        """
+        bit = 1 << i
+        graph = nx.Graph(timestamp=self.timestamps[i])
+        graph.add_edges_from((self.node_labels[i1], self.node_labels[i2]) for i1, neighbors in enumerate(self.adj)
+                             for i2, bits in neighbors.items() if i1 < i2 and bits & bit)
+        return graph
 
     def nodes(self):
         """
         Returns the nodes in the ensemble
         :return: list of nodes
         """
-        nodes = []
-        for G in self.get_all_static_graphs():
-            nodes = list(set(G.nodes()) | set(nodes))
-        return nodes
+        return list(self.node_labels)
 
     def size(self):
         """
@@ -83,14 +249,16 @@ class Ensemble:
 
         :return: int
         """
-        return sum([G.size() for G in self.get_all_static_graphs()])
+        if self.time_mask is None:
+            return self.num_of_edges
+        return sum(self.get_num_of_edges_in_static_graphs())
 
     def order(self):
         """
         Returns number of nodes in the temporal graph
         :return: int
         """
-        return len(self.nodes())
+        return len(self.node_labels)
 
     def add_node(self, v, **attr):
         """
@@ -98,31 +266,541 @@ class Ensemble:
         :param v: node
         :return: None
         """
-        for G in self.get_all_static_graphs():
-            G.add_node(v, attr)
+        self.node_attr[self.__intern_node(v)].update(attr)
+
+    def __intern_node(self, v):
+        """
+        Returns the id of node v, a new id is assigned if v is not in the ensemble
+        :param v: node
+        :return: int
+        """
+        if v not in self.node_ids:
+            self.node_ids[v] = len(self.node_labels)
+            self.node_labels.append(v)
+            self.node_attr.append({})
+            self.adj.append({})
+        return self.node_ids[v]
+
+    def get_node_id(self, v):
+        """
+        Returns the id of node v
+        :param v: node
+        :return: int
+        """
+        return self.node_ids[v]
+
+    def get_node_ids(self, nodes):
+        """
+        Returns the ids of the given nodes
+        :param nodes: list of nodes
+        :return: numpy array of int32
+        """
+        return np.array([self.node_ids[v] for v in nodes], dtype=np.int32)
+
+    def get_node_label(self, i):
+        """
+        Returns the node with id i
+        :param i: int
+        :return: node
+        """
+        return self.node_labels[i]
+
+    def get_node_labels(self, ids):
+        """
+        Returns the nodes with the given ids
+        :param ids: list of int
+        :return: list of nodes
+        """
+        return [self.node_labels[i] for i in ids]
 
     def add_edge(self, t, v1, v2, **attr):
         """
-        Add a single edge from v1 to v2 and updates edge attributes
+        Add a single edge from v1 to v2
+
+        Note: edge attributes are not stored by the bit matrix
         :param t: int - timestamp at which the edge exists
         :param v1: node 1 (int or str)
         :param v2: node 2 (int or str)
         :return: None
         """
-        if t not in self.get_all_timestamps():
+        if t not in self.timestamp_index:
             self.add_graph(t)
-        self.get_static_graph_at_timestamp(t).add_edge(v1, v2, attr)
+        i = self.timestamp_index[t]
+        bit = 1 << i
+        i1 = self.__intern_node(v1)
+        i2 = self.__intern_node(v2)
+        bits = self.adj[i1].get(i2, 0)
+        if not bits & bit:
+            self.adj[i1][i2] = self.adj[i2][i1] = bits | bit
+            self.time_edge_counts[i] += 1
+            self.time_hashes[i] ^= DynamicNodeSet.pair_key(i1, i2)
+            self.num_of_edges += 1
+            self.nonempty_mask |= bit
+
+    def add_edges_from_arrays(self, timestamps, v1s, v2s):
+        """
+        Add the edges (timestamps[i], v1s[i], v2s[i]) to the ensemble in a single pass
+
+        Rows with v1s[i] == v2s[i] add the node v1s[i] without an edge, same as add_node. Nodes and timestamps are added
+        in the order in which they first appear, so the result is the same as calling add_edge for every row.
+        :param timestamps: array of timestamps
+        :param v1s: array of nodes
+        :param v2s: array of nodes
+        :return: None
+        """
+        timestamps = np.asarray(timestamps)
+        v1s = np.asarray(v1s)
+        v2s = np.asarray(v2s)
+        if len(timestamps) == 0:
+            return None
+        labels, first, node_index = unique_with_first_index(np.column_stack((v1s, v2s)).ravel())
+        labels = decode(labels).tolist()
+        label_ids = np.zeros(len(labels), dtype=np.int64)
+        for i in np.argsort(first, kind='stable'):
+            label_ids[i] = self.__intern_node(labels[i])
+
+        is_edge = v1s != v2s
+        if not is_edge.any():
+            return None
+        times, first, time_index = unique_with_first_index(timestamps[is_edge])
+        times = decode(times).tolist()
+        for i in np.argsort(first, kind='stable'):
+            self.add_graph(times[i])
+        time_index = np.array([self.timestamp_index[t] for t in times], dtype=np.int64)[time_index]
+
+        # one key per distinct (node pair, timestamp)
+        node_index = node_index.reshape(-1, 2)[is_edge].astype(np.int64)
+        pair = node_index.min(axis=1) * len(labels) + node_index.max(axis=1)
+        keys = np.sort(pair * len(self.timestamps) + time_index)
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+        pair, time_index = np.divmod(keys, len(self.timestamps))
+        # the keys are sorted by pair, row is the index of the pair of every key among the distinct pairs
+        new_pair = np.concatenate(([True], pair[1:] != pair[:-1]))
+        pairs = pair[new_pair]
+        row = np.cumsum(new_pair) - 1
+        for i, count in enumerate(np.bincount(time_index, minlength=len(self.timestamps)).tolist()):
+            self.time_edge_counts[i] += count
+        time_hashes = np.zeros(len(self.timestamps), dtype=np.uint64)
+        np.bitwise_xor.at(time_hashes, time_index, DynamicNodeSet.pair_keys(label_ids[pair // len(labels)],
+                                                                            label_ids[pair % len(labels)]))
+        for i, time_hash in enumerate(time_hashes.tolist()):
+            self.time_hashes[i] ^= time_hash
+        self.num_of_edges += len(keys)
+
+        # the bit rows are assembled for a block of pairs at a time to bound the memory used
+        num_of_bytes = (len(self.timestamps) + 7) // 8
+        block_size = max(1, (1 << 24) // num_of_bytes)
+        bits = []
+        for start in range(0, len(pairs), block_size):
+            stop = min(start + block_size, len(pairs))
+            lo, hi = np.searchsorted(row, [start, stop])
+            bit_rows = np.zeros((stop - start, num_of_bytes), dtype=np.uint8)
+            np.bitwise_or.at(bit_rows, (row[lo:hi] - start, time_index[lo:hi] // 8),
+                             np.left_shift(1, time_index[lo:hi] % 8).astype(np.uint8))
+            bits.extend(from_bit_rows(bit_rows))
+        first, second = np.divmod(pairs, len(labels))
+        v1s, v2s = label_ids[first].tolist(), label_ids[second].tolist()
+
+        # the pairs are sorted by their first node, the neighbours of a node are added to its row at once
+        bounds = Ensemble.__group_bounds(first)
+        for lo, hi in zip(bounds, bounds[1:]):
+            self.__merge_edge_bits(v1s[lo], v2s[lo:hi], lo, bits)
+        for lo, hi in zip(bounds, bounds[1:]):
+            self.adj[v1s[lo]].update(zip(v2s[lo:hi], bits[lo:hi]))
+        # then by their second node for the symmetric entries
+        order = np.argsort(second, kind='stable')
+        bounds = Ensemble.__group_bounds(second[order])
+        order = order.tolist()
+        v1s, v2s = operator.itemgetter(*order)(v1s), operator.itemgetter(*order)(v2s)
+        bits = operator.itemgetter(*order)(bits)
+        if len(order) == 1:
+            v1s, v2s, bits = (v1s,), (v2s,), (bits,)
+        for lo, hi in zip(bounds, bounds[1:]):
+            self.adj[v2s[lo]].update(zip(v1s[lo:hi], bits[lo:hi]))
+        for i, count in enumerate(self.time_edge_counts):
+            if count:
+                self.nonempty_mask |= 1 << i
+        return None
+
+    @staticmethod
+    def __group_bounds(keys):
+        """
+        Returns the bounds of the runs of equal keys
+        :param keys: numpy array
+        :return: list of int - start of every run followed by the number of keys
+        """
+        return np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1]))).tolist() + [len(keys)]
+
+    def __merge_edge_bits(self, i1, neighbors, offset, bits):
+        """
+        Adds to the new bitsets of the pairs of node i1 the timestamps at which the pairs already had an edge, which
+        are not counted twice
+        :param i1: int - node id
+        :param neighbors: list of int - node ids of the pairs of i1
+        :param offset: int - index of the bitset of the first pair in bits, the others follow
+        :param bits: list of int - new bitsets of the pairs, updated in place
+        :return: None
+        """
+        old_neighbors = self.adj[i1]
+        if not old_neighbors:
+            return None
+        # the keys of the neighbours of a loaded ensemble are a list
+        shared = set(old_neighbors.keys()).intersection(neighbors)
+        if shared:
+            position = dict(zip(neighbors, range(offset, offset + len(neighbors))))
+            for i2 in shared:
+                k = position[i2]
+                old_bits = old_neighbors[i2]
+                for i in iter_bits(old_bits & bits[k]):
+                    self.time_edge_counts[i] -= 1
+                    self.time_hashes[i] ^= DynamicNodeSet.pair_key(i1, i2)
+                    self.num_of_edges -= 1
+                bits[k] |= old_bits
+        return None
+
+    @classmethod
+    def from_edge_arrays(cls, timestamps, v1s, v2s):
+        """
+        Returns an ensemble with the edges (timestamps[i], v1s[i], v2s[i])
+        :param timestamps: array of timestamps
+        :param v1s: array of nodes
+        :param v2s: array of nodes
+        :return: Ensemble
+        """
+        ensemble = cls()
+        ensemble.add_edges_from_arrays(timestamps, v1s, v2s)
+        return ensemble
+
+    @classmethod
+    def from_tsv(cls, filename, node_type=str, chunk_size=1 << 26):
+        """
+        Returns an ensemble read from a file with one tab separated 'timestamp v1 v2' edge per line
+
+        The file is read in chunks of about chunk_size bytes and every chunk is added with add_edges_from_arrays.
+        :param filename: str - path of the input file
+        :param node_type: type of the nodes, e.g. int or str
+        :param chunk_size: int - number of bytes read at once
+        :return: Ensemble
+        """
+        ensemble = cls()
+        with open(filename, 'rb') as f:
+            line_number = 1
+            lines = f.readlines(chunk_size)
+            while lines:
+                fields = Ensemble.__split_tsv_lines(lines, line_number)
+                line_number += len(lines)
+                nodes = fields[:, 1:] if node_type is str else fields[:, 1:].astype(node_type)
+                ensemble.add_edges_from_arrays(fields[:, 0], nodes[:, 0], nodes[:, 1])
+                lines = f.readlines(chunk_size)
+        return ensemble
+
+    @staticmethod
+    def __split_tsv_lines(lines, line_number=1):
+        """
+        Returns the fields of lines split like line.strip().split(b'\\t', 2), blank lines are skipped
+
+        When every line has exactly two tabs and no whitespace to strip but a trailing carriage return, the fields are
+        cut from the bytes of the lines at once. Otherwise the lines are split one at a time.
+        :param lines: list of bytes
+        :param line_number: int - line number of the first line, for the errors
+        :return: numpy array of bytes of shape (number of lines, 3)
+        """
+        data = b''.join(lines)
+        buffer = np.frombuffer(data + b'\n', dtype=np.uint8)
+        ends = np.flatnonzero(buffer == ord('\n'))
+        starts = np.concatenate(([0], ends[:-1] + 1))
+        ends -= (ends > starts) & (buffer[ends - 1] == ord('\r'))
+        starts, ends = starts[ends > starts], ends[ends > starts]
+        tabs = np.flatnonzero(buffer == ord('\t'))
+        whitespace = np.zeros(256, dtype=bool)
+        whitespace[list(b' \t\n\r\x0b\x0c')] = True
+        if len(tabs) == 2 * len(ends) and \
+                (starts < tabs[0::2]).all() and (tabs[1::2] < ends).all() and \
+                not whitespace[buffer[starts]].any() and not whitespace[buffer[ends - 1]].any():
+            # every line has its two tabs and no whitespace to strip, the fields are cut from the bytes of the lines
+            # into fixed width byte strings one character position at a time
+            tabs = tabs.reshape(-1, 2)
+            field_starts = np.column_stack((starts, tabs + 1)).ravel()
+            field_lengths = np.column_stack((tabs, ends)).ravel() - field_starts
+            width = max(1, int(field_lengths.max(initial=0)))
+            chars = np.zeros((len(field_starts), width), dtype=np.uint8)
+            for j in range(width):
+                rows = np.flatnonzero(field_lengths > j)
+                chars[rows, j] = buffer[field_starts[rows] + j]
+            return chars.view('S%d' % width).reshape(-1, 3)
+        rows = []
+        for k, line in enumerate(lines):
+            line = line.strip()
+            if line:
+                row = line.split(b'\t', 2)
+                if len(row) != 3:
+                    raise ValueError('line %d has %d tab separated fields instead of 3: %r' %
+                                     (line_number + k, len(row), line))
+                rows.append(row)
+        return np.array(rows, dtype=bytes).reshape(-1, 3)
+
+    def save(self, dirname):
+        """
+        Writes the ensemble to the directory dirname in a binary format which can be opened with load
+
+        The directory holds one .npy file per array: the node table, the timestamps in bit order, the number of edges
+        and the hash of the edge set per timestamp, the CSR adjacency of the nodes (indptr, neighbors, rows) and the
+        pair-time bit matrix whose row rows[k] is the packed timestamp bitset of the k-th adjacency entry. The files
+        are written to a temporary directory which then replaces dirname, so an interrupted save leaves no partial
+        ensemble at dirname.
+
+        Note: node attributes are not saved, node labels and timestamps are saved as a single numpy type (int or str).
+        A view is saved with the timestamps it covers only.
+        :param dirname: str - path of the directory
+        :return: None
+        """
+        dirname = os.path.normpath(dirname)
+        tmp_dirname = '%s.tmp%d' % (dirname, os.getpid())
+        if os.path.isdir(tmp_dirname):
+            shutil.rmtree(tmp_dirname)
+        os.makedirs(tmp_dirname)
+        try:
+            self.__write_arrays(tmp_dirname)
+        except BaseException:
+            shutil.rmtree(tmp_dirname, ignore_errors=True)
+            raise
+        if os.path.isdir(dirname):
+            # a directory cannot replace a non empty one, the old directory is moved away first
+            old_dirname = '%s.old%d' % (dirname, os.getpid())
+            os.replace(dirname, old_dirname)
+            os.replace(tmp_dirname, dirname)
+            shutil.rmtree(old_dirname)
+        else:
+            os.replace(tmp_dirname, dirname)
+        return None
+
+    def __write_arrays(self, dirname):
+        """
+        Writes the arrays of the binary format to the existing directory dirname, see save
+        :param dirname: str - path of the directory
+        :return: None
+        """
+        covered = list(iter_bits(self.get_time_mask()))
+        timestamps = np.array([self.timestamps[i] for i in covered])
+        np.save(os.path.join(dirname, 'node_labels.npy'), np.array(self.node_labels))
+        np.save(os.path.join(dirname, 'timestamps.npy'), timestamps)
+        np.save(os.path.join(dirname, 'time_edge_counts.npy'),
+                np.array(self.get_num_of_edges_in_static_graphs(), dtype=np.int64))
+        np.save(os.path.join(dirname, 'time_hashes.npy'), np.array([self.time_hashes[i] for i in covered],
+                                                                    dtype=np.uint64))
+
+        mask = self.get_time_mask()
+        indptr = np.zeros(self.order() + 1, dtype=np.int64)
+        neighbors = []
+        rows = []
+        pair_rows = {}
+        for i in range(self.order()):
+            for j, bits in sorted(self.adj[i].items()):
+                if bits & mask:
+                    neighbors.append(j)
+                    rows.append(pair_rows.setdefault((min(i, j), max(i, j)), len(pair_rows)))
+            indptr[i + 1] = len(neighbors)
+        np.save(os.path.join(dirname, 'adj_indptr.npy'), indptr)
+        np.save(os.path.join(dirname, 'adj_neighbors.npy'), np.array(neighbors, dtype=np.int32))
+        np.save(os.path.join(dirname, 'adj_rows.npy'), np.array(rows, dtype=np.int64))
+
+        num_of_bytes = (len(self) + 7) // 8
+        edge_bits = open_memmap(os.path.join(dirname, 'edge_bits.npy'), mode='w+', dtype=np.uint8,
+                                shape=(len(pair_rows), num_of_bytes))
+        for (i, j), row in pair_rows.items():
+            edge_bits[row] = np.packbits(to_bit_array(self.adj[i][j], len(self.timestamps))[covered], bitorder='little')
+        edge_bits.flush()
+        del edge_bits
+        return None
+
+    @classmethod
+    def load(cls, dirname, mmap_mode=None):
+        """
+        Returns the ensemble written to the directory dirname by save
+
+        By default the arrays are read into memory and the adjacency is rebuilt as neighbour dicts, as fast to mine as
+        an ensemble built from the edges. With mmap_mode, the ensemble is kept out of core: the adjacency and the
+        pair-time bit matrix are memory-mapped (see MappedAdjacency) and only the rows which are used are read from
+        disk, each time they are used, which makes mining several times slower. Edges and nodes added to the loaded
+        ensemble are kept in memory and are not written back.
+        :param dirname: str - path of the directory
+        :param mmap_mode: str - numpy memmap mode of the adjacency arrays for an out of core ensemble, e.g. 'r', None
+                          to load them into memory
+        :return: Ensemble
+        """
+        ensemble = cls()
+        ensemble.node_labels = np.load(os.path.join(dirname, 'node_labels.npy')).tolist()
+        ensemble.node_ids = dict((v, i) for i, v in enumerate(ensemble.node_labels))
+        ensemble.node_attr = [{} for v in ensemble.node_labels]
+        ensemble.timestamps = np.load(os.path.join(dirname, 'timestamps.npy')).tolist()
+        ensemble.timestamp_index = dict((t, i) for i, t in enumerate(ensemble.timestamps))
+        # same order as indexing the timestamps one at a time, the sort is stable
+        keys = [timestamp_sort_key(t) for t in ensemble.timestamps]
+        ensemble.sorted_timestamp_indices = sorted(range(len(keys)), key=keys.__getitem__)
+        ensemble.sorted_timestamp_keys = [keys[i] for i in ensemble.sorted_timestamp_indices]
+        ensemble.time_edge_counts = np.load(os.path.join(dirname, 'time_edge_counts.npy')).tolist()
+        ensemble.num_of_edges = sum(ensemble.time_edge_counts)
+        for i, count in enumerate(ensemble.time_edge_counts):
+            if count:
+                ensemble.nonempty_mask |= 1 << i
+        arrays = [np.load(os.path.join(dirname, name + '.npy'), mmap_mode=mmap_mode)
+                  for name in ['adj_indptr', 'adj_neighbors', 'adj_rows', 'edge_bits']]
+        if mmap_mode is None:
+            ensemble.adj = Ensemble.__adjacency_from_arrays(*arrays)
+        else:
+            ensemble.adj = MappedAdjacency(*arrays)
+        if os.path.exists(os.path.join(dirname, 'time_hashes.npy')):
+            ensemble.time_hashes = np.load(os.path.join(dirname, 'time_hashes.npy')).tolist()
+        else:
+            # directories written before the hashes were saved
+            ensemble.time_hashes = ensemble.__hash_snapshots()
+        return ensemble
+
+    @staticmethod
+    def __adjacency_from_arrays(indptr, neighbors, rows, edge_bits):
+        """
+        Returns the neighbour dicts of the adjacency arrays written by save
+        :param indptr: numpy array - the neighbours of node i are neighbors[indptr[i]:indptr[i + 1]]
+        :param neighbors: numpy array of the neighbour ids
+        :param rows: numpy array - row of edge_bits of every neighbour
+        :param edge_bits: numpy array of uint8 - packed timestamp bitset of every pair
+        :return: list of dict {neighbour id: bitset}
+        """
+        pair_bits = from_bit_rows(edge_bits)
+        # both nodes of a pair share the bitset of its row
+        bits = [pair_bits[row] for row in rows.tolist()]
+        neighbors = neighbors.tolist()
+        indptr = indptr.tolist()
+        return [dict(zip(neighbors[lo:hi], bits[lo:hi])) for lo, hi in zip(indptr, indptr[1:])]
+
+    def __hash_snapshots(self):
+        """
+        Returns the Zobrist hash of the edge set of every timestamp computed from the bit matrix
+        :return: list of int
+        """
+        time_hashes = np.zeros(len(self.timestamps), dtype=np.uint64)
+        for i1, neighbors in enumerate(self.adj):
+            for i2, bits in neighbors.items():
+                if i1 < i2 and bits:
+                    time_hashes[np.flatnonzero(to_bit_array(bits, len(self.timestamps)))] ^= \
+                        np.uint64(DynamicNodeSet.pair_key(i1, i2))
+        return time_hashes.tolist()
+
+    @classmethod
+    def open_tsv(cls, filename, node_type=str, store=False):
+        """
+        Returns the ensemble of a tab separated edge file
+
+        The ensemble is loaded into memory from the binary copy filename.<node_type>.ensemble when it is newer than
+        the file, otherwise the file is parsed with from_tsv and the binary copy is written for the next run. With
+        store, the induced subgraph counts are kept in the store subgraph_counts.sqlite of the binary copy (see
+        use_store), which is emptied when the file changes.
+        :param filename: str - path of the input file
+        :param node_type: type of the nodes, e.g. int or str
+        :param store: boolean - True to share the induced subgraph counts with the other runs on the file
+        :return: Ensemble
+        """
+        dirname = '%s.%s.ensemble' % (filename, node_type.__name__)
+        edge_bits = os.path.join(dirname, 'edge_bits.npy')
+        store_filename = os.path.join(dirname, 'subgraph_counts.sqlite')
+        if os.path.exists(edge_bits) and os.path.getmtime(edge_bits) >= os.path.getmtime(filename):
+            ensemble = cls.load(dirname)
+        else:
+            ensemble = cls.from_tsv(filename, node_type)
+            ensemble.save(dirname)
+            if os.path.exists(store_filename):
+                os.remove(store_filename)
+        if store:
+            ensemble.use_store(store_filename)
+        return ensemble
 
     def add_graph(self, timestamp):
         """
-        Add a graph at given timestamp
+        Add an empty graph at given timestamp
         :param timestamp: int
         :return: None
         """
-        if timestamp not in self.get_all_timestamps():
-            graph = nx.Graph(timestamp=timestamp)
-            graph.add_nodes_from(self.nodes())
-            self.time_graph_dict[timestamp] = graph
+        if timestamp not in self.timestamp_index:
+            self.timestamp_index[timestamp] = len(self.timestamps)
+            self.timestamps.append(timestamp)
+            self.time_edge_counts.append(0)
+            self.time_hashes.append(0)
+            self.__index_timestamp(len(self.timestamps) - 1)
+
+    def append_snapshot(self, timestamp, edges, nodes=()):
+        """
+        Add the static graph with the given edges at a new timestamp
+
+        Note: a snapshot should be appended to the ensemble rather than to a view of it. Use UCTracker to update the
+        UCs of the ensemble after the snapshot is appended.
+        :param timestamp: timestamp of the snapshot
+        :param edges: list of (v1, v2) edges of the static graph
+        :param nodes: list of nodes without any edge to add to the ensemble
+        :return: None
+        """
+        self.add_graph(timestamp)
+        for v in nodes:
+            self.add_node(v)
+        for v1, v2 in edges:
+            self.add_edge(timestamp, v1, v2)
+        return None
+
+    def __index_timestamp(self, i):
+        """
+        Inserts the i-th timestamp into the chronological index
+        :param i: int - index of the timestamp
+        :return: None
+        """
+        key = timestamp_sort_key(self.timestamps[i])
+        k = bisect.bisect_right(self.sorted_timestamp_keys, key)
+        self.sorted_timestamp_keys.insert(k, key)
+        self.sorted_timestamp_indices.insert(k, i)
+
+    def slice(self, t_start=None, t_end=None):
+        """
+        Returns a view of the ensemble restricted to the timestamps t with t_start <= t < t_end
+
+        Timestamps are compared by their parsed values, e.g. slice('2004-09', '2005-01') covers the months from
+        September to December 2004. The view shares its storage with this ensemble, no graph is copied, so edges
+        should be added to this ensemble rather than to the view.
+        :param t_start: first timestamp of the view, None for no lower bound
+        :param t_end: timestamp after the last timestamp of the view, None for no upper bound
+        :return: Ensemble
+        """
+        start = 0
+        end = len(self.sorted_timestamp_keys)
+        if t_start is not None:
+            start = bisect.bisect_left(self.sorted_timestamp_keys, timestamp_sort_key(t_start))
+        if t_end is not None:
+            end = bisect.bisect_left(self.sorted_timestamp_keys, timestamp_sort_key(t_end))
+        return self.__view(self.sorted_timestamp_indices[start:end])
+
+    def window(self, start, width):
+        """
+        Returns a view of the ensemble restricted to width consecutive timestamps in chronological order
+
+        window(0, 6) covers the six earliest timestamps of the ensemble, window(1, 6) the next six, and so on.
+        :param start: int - position of the first timestamp of the view in chronological order
+        :param width: int - number of timestamps in the view
+        :return: Ensemble
+        """
+        mask = self.get_time_mask()
+        indices = [i for i in self.sorted_timestamp_indices if mask >> i & 1]
+        return self.__view(indices[start:start + width])
+
+    def __view(self, indices):
+        """
+        Returns a view of the ensemble restricted to the timestamps with the given indices
+        :param indices: list of int - indices of timestamps
+        :return: Ensemble
+        """
+        mask = 0
+        for i in indices:
+            mask |= 1 << i
+        view = copy.copy(self)
+        view.time_mask = mask & self.get_time_mask()
+        view.subgraph_counts = LRUCache(self.subgraph_counts.max_bytes)
+        return view
 
     def has_edge(self, v1, v2):
         """
@@ -131,7 +809,54 @@ class Ensemble:
         :param v2: node 2 (int or str)
         :return: float
         """
-        return float(len(self.find_edge(v1, v2))) / self.get_num_of_timestamps()
+        return float(popcount(self.get_edge_bits(v1, v2))) / self.get_num_of_timestamps()
+
+    def has_edge_many(self, pairs):
+        """
+        Returns the probability that an edge exists for every pair of nodes
+        :param pairs: list of (v1, v2) pairs of nodes
+        :return: numpy array of float
+        """
+        node_ids = self.node_ids
+        adj = self.adj
+        bits = [adj[node_ids[v1]].get(node_ids[v2], 0) if v1 in node_ids and v2 in node_ids else 0
+                for v1, v2 in pairs]
+        return self.__count_edge_bits(bits) / float(self.get_num_of_timestamps())
+
+    def edge_probability_matrix(self, sparse=None):
+        """
+        Returns the matrix of the probabilities that an edge exists between the nodes with ids i and j
+
+        The bitsets of all the pairs which have an edge at some timestamp are counted in a single pass. The matrix is a
+        dense numpy array or a scipy.sparse csr matrix, by default the sparse matrix is returned when scipy is installed
+        and less than 10% of the entries are non zero.
+        :param sparse: boolean - True for a scipy.sparse matrix, False for a numpy array, None to choose by density
+        :return: N x N symmetric matrix of float, N is the number of nodes
+        """
+        n = self.order()
+        entries = list(itertools.chain.from_iterable(neighbors.items() for neighbors in self.adj))
+        rows = np.repeat(np.arange(n, dtype=np.int64), [len(neighbors) for neighbors in self.adj])
+        cols = np.array([j for j, bits in entries], dtype=np.int64)
+        counts = self.__count_edge_bits([bits for j, bits in entries])
+        present = counts > 0
+        rows, cols = rows[present], cols[present]
+        probabilities = counts[present] / float(self.get_num_of_timestamps())
+        if sparse is None:
+            sparse = scipy_sparse is not None and len(probabilities) < 0.1 * n * n
+        if sparse:
+            return scipy_sparse.csr_matrix((probabilities, (rows, cols)), shape=(n, n))
+        matrix = np.zeros((n, n))
+        matrix[rows, cols] = probabilities
+        return matrix
+
+    def __count_edge_bits(self, bits):
+        """
+        Returns the number of timestamps of the ensemble in every edge bitset
+        :param bits: list of int - edge bitsets
+        :return: numpy array of int
+        """
+        mask = self.get_time_mask()
+        return np.fromiter(map(popcount, map(mask.__and__, bits)), dtype=np.int64, count=len(bits))
 
     def find_edge(self, v1, v2):
         """
@@ -140,7 +865,18 @@ class Ensemble:
         :param v2: node 2 (int or str)
         :return: list of timestamps
         """
-        return [G.graph['timestamp'] for G in self.get_all_static_graphs() if G.has_edge(v1, v2)]
+        return [self.timestamps[i] for i in iter_bits(self.get_edge_bits(v1, v2))]
+
+    def get_edge_bits(self, v1, v2):
+        """
+        Returns the bitset of timestamps at which an edge exists from v1 to v2
+        :param v1: node 1 (int or str)
+        :param v2: node 2 (int or str)
+        :return: int - i-th bit is set if the edge exists at i-th timestamp
+        """
+        if v1 in self.node_ids and v2 in self.node_ids:
+            return self.adj[self.node_ids[v1]].get(self.node_ids[v2], 0) & self.get_time_mask()
+        return 0
 
     def find_subgraph(self, graph):
         """
@@ -148,27 +884,255 @@ class Ensemble:
         :param graph: graph object
         :return: list of timestamps
         """
+        return [self.timestamps[i] for i in iter_bits(self.get_subgraph_bits(graph))]
 
-        timestamps = [g.graph['timestamp'] for g in self.get_all_static_graphs() if
-                      Ensemble.is_matching_graph(graph, g.subgraph(graph.nodes()))]
-        return timestamps
+    def get_subgraph_bits(self, graph):
+        """
+        Returns the bitset of timestamps at which the subgraph induced by the nodes of 'graph' is exactly 'graph'
+
+        The bitsets of the pairs of nodes of the ensemble are the postings of its edges: the result is the intersection
+        of the postings of the edges of 'graph' minus the postings of the pairs of its nodes which are not edges of it.
+        :param graph: graph object
+        :return: int - i-th bit is set if the subgraph is present at i-th timestamp
+        """
+        mask = self.get_time_mask()
+        for v1, v2 in graph.edges():
+            mask &= self.get_edge_bits(v1, v2)
+            if not mask:
+                return 0
+        ids = [self.node_ids[v] for v in graph.nodes() if v in self.node_ids]
+        edges = set(frozenset((self.node_ids[v1], self.node_ids[v2])) for v1, v2 in graph.edges())
+        for k, i1 in enumerate(ids):
+            neighbors = self.adj[i1]
+            for i2 in ids[k:]:
+                bits = neighbors.get(i2, 0)
+                if bits and frozenset((i1, i2)) not in edges:
+                    mask &= ~bits
+                    if not mask:
+                        return 0
+        return mask
 
-    def find_subgraphs_induced_by_nodes(self, nodes):
+    def find_subgraphs_induced_by_nodes(self, nodes, num_of_workers=None):
         """
         Returns a dictionary of edgelists mapped to timestamp at which the given edgelist is induced by the given nodes
+
+        With num_of_workers, the timestamps are split into ranges which are partitioned by the pool of processes of
+        the ensemble (see use_process_pool), which pays off for large node sets of ensembles with very many timestamps.
+        Note: static graphs without any edge are ignored
         :param nodes: list of nodes
+        :param num_of_workers: int - number of processes, None to partition the timestamps in this process
         :return: dict {string representation of edgelist: list of timestamps}
         """
         found_subgraphs = {}
-        for G in self.get_all_static_graphs():
-            if G.size() > 0:
-                subgraph = str(sorted([tuple(sorted(e)) for e in G.subgraph(nodes).edges()], key=lambda tup: (tup[0], tup[1])))
-                if subgraph in found_subgraphs:
-                    found_subgraphs[subgraph].append(G.graph['timestamp'])
-                else:
-                    found_subgraphs[subgraph] = [G.graph['timestamp']]
+        ids = [self.node_ids[v] for v in sorted(set(nodes)) if v in self.node_ids]
+        pairs = list(itertools.combinations(self.get_node_labels(ids), 2))
+        if num_of_workers:
+            nonempty_mask = self.get_nonempty_mask()
+            nonempty = np.flatnonzero(to_bit_array(nonempty_mask, len(self.timestamps)))
+            induced_pairs, num_of_pairs = self.__find_induced_pairs(ids, nonempty_mask)
+            for first, count, signature, indices in self.__count_signatures_in_parallel(
+                    self.__get_process_pool(num_of_workers), nonempty, None, induced_pairs, num_of_pairs,
+                    num_of_workers, return_indices=True):
+                edges = [pairs[q] for q in iter_bits(signature)]
+                found_subgraphs[str(edges)] = [self.timestamps[i] for i in indices.tolist()]
+            return found_subgraphs
+        for mask, signature in self.__partition_timestamps_by_induced_subgraph(ids):
+            edges = [pairs[q] for q in iter_bits(signature)]
+            found_subgraphs[str(edges)] = [self.timestamps[i] for i in iter_bits(mask)]
         return found_subgraphs
 
+    def count_induced_subgraphs_of_ids(self, ids):
+        """
+        Returns the number of non empty timestamps at which each distinct subgraph is induced by the given node ids
+
+        The induced subgraph is identified by its signature, an int whose q-th bit is set if the q-th pair of
+        itertools.combinations(ids, 2) is an edge. The counts of sorted node ids are read from and written to the
+        persistent store if the ensemble uses one (see use_store).
+        :param ids: list of distinct node ids
+        :return: dict {signature: number of timestamps}
+        """
+        ids = tuple(ids)
+        if self.store is not None and ids == self.__get_subgraph_counts_key(ids):
+            return dict((signature, count) for count, signature in self.__count_subgraphs_of_key(ids))
+        return dict((signature, count) for count, signature in self.__count_timestamps_by_induced_subgraph(ids))
+
+    def __partition_timestamps_by_induced_subgraph(self, ids):
+        """
+        Returns the partition of non empty timestamps into classes which induce the same subgraph on the given nodes
+
+        Classes are ordered by their first timestamp.
+        :param ids: list of node ids
+        :return: list of (bitset of timestamps, signature of the induced subgraph), the q-th bit of the signature is
+                 set if the q-th pair of itertools.combinations(ids, 2) is an edge
+        """
+        nonempty_mask = self.get_nonempty_mask()
+        pairs, num_of_pairs = self.__find_induced_pairs(ids, nonempty_mask)
+        return Ensemble.__refine_timestamps(nonempty_mask, pairs)
+
+    def __count_timestamps_by_induced_subgraph(self, ids, num_of_workers=None):
+        """
+        Returns the number of non empty timestamps at which each distinct subgraph is induced by the given nodes
+
+        Only the representatives of the distinct static graphs are partitioned (see get_unique_snapshots) and every
+        class counts the multiplicities of its representatives. Small node sets are counted by refining the partition
+        of the representatives one pair at a time. When the refinement would have to split many classes for many pairs,
+        the signatures of all representatives are computed at once with numpy instead, by a pool of processes with
+        num_of_workers.
+        :param ids: list of node ids
+        :param num_of_workers: int - number of processes, None to count in this process
+        :return: list of (number of timestamps, signature of the induced subgraph) ordered by first timestamp
+        """
+        unique_mask, indices, multiplicities, weights = self.__find_unique_snapshots()
+        pairs, num_of_pairs = self.__find_induced_pairs(ids, unique_mask)
+        if num_of_workers:
+            return [(count, signature) for first, count, signature in self.__count_signatures_in_parallel(
+                self.__get_process_pool(num_of_workers), indices, multiplicities if weights is not None else None,
+                pairs, num_of_pairs, num_of_workers)]
+        # upper bound on the number of classes split by the refinement: a pair adds at most one class per timestamp
+        # at which its edge is present
+        num_of_unique = len(indices)
+        num_of_classes = 1
+        work = 0
+        for q, bits in pairs:
+            work += num_of_classes
+            num_of_classes = min(num_of_unique, num_of_classes + popcount(bits))
+        if work < Ensemble.BULK_SIGNATURE_WORK:
+            classes = Ensemble.__refine_timestamps(unique_mask, pairs)
+            if weights is None:
+                return [(popcount(mask), signature) for mask, signature in classes]
+            return [(sum(weights[i] for i in iter_bits(mask)), signature) for mask, signature in classes]
+        return self.__count_signatures_in_bulk(indices, multiplicities if weights is not None else None,
+                                              pairs, num_of_pairs)
+
+    def __find_induced_pairs(self, ids, mask):
+        """
+        Returns the node pairs of the given nodes which have an edge at any of the given timestamps
+        :param ids: list of node ids
+        :param mask: int - bitset of timestamps
+        :return: list of (position q of the pair in itertools.combinations(ids, 2), bitset of the pair restricted to
+                 the timestamps), number of pairs
+        """
+        ids = list(dict.fromkeys(ids))
+        pairs = []
+        q = 0
+        for k, i1 in enumerate(ids):
+            neighbors = self.adj[i1]
+            for i2 in ids[k + 1:]:
+                bits = neighbors.get(i2, 0) & mask
+                if bits:
+                    pairs.append((q, bits))
+                q += 1
+        return pairs, q
+
+    @staticmethod
+    def __refine_timestamps(nonempty_mask, pairs):
+        """
+        Returns the partition of the non empty timestamps by induced subgraph
+
+        The partition is refined one node pair at a time by splitting every class into the timestamps at which the
+        edge is present and the timestamps at which it is absent. Classes are ordered by their first timestamp.
+        :param nonempty_mask: int - bitset of non empty timestamps
+        :param pairs: list of (position of the pair, bitset of the pair)
+        :return: list of (bitset of timestamps, signature of the induced subgraph)
+        """
+        classes = [(nonempty_mask, 0)] if nonempty_mask else []
+        for q, bits in pairs:
+            edge = 1 << q
+            refined = []
+            for mask, signature in classes:
+                present = mask & bits
+                if present:
+                    refined.append((present, signature | edge))
+                if present != mask:
+                    refined.append((mask & ~bits, signature))
+            classes = refined
+        return sorted(classes, key=lambda c: c[0] & -c[0])
+
+    def __count_signatures_in_bulk(self, nonempty, multiplicities, pairs, num_of_pairs):
+        """
+        Returns the number of non empty timestamps of every induced subgraph, computed with numpy, see
+        count_signatures_of_pairs
+        :param nonempty: numpy array of int - indices of the timestamps
+        :param multiplicities: numpy array of int - number of timestamps represented by every timestamp, None for one
+        :param pairs: list of (position of the pair, bitset of the pair)
+        :param num_of_pairs: int - number of pairs of the node set
+        :return: list of (number of timestamps, signature of the induced subgraph) ordered by first timestamp
+        """
+        return [(count, signature) for first, count, signature in
+                count_signatures_of_pairs(nonempty, multiplicities, pairs, num_of_pairs, len(self.timestamps))]
+
+    def use_process_pool(self, pool):
+        """
+        Counts the induced subgraphs of the ensemble and its views with the given pool whenever a number of workers is
+        given, rather than with the pool of processes the ensemble creates at the first such count and keeps until it
+        is collected or the process exits. The caller shuts the given pool down.
+        :param pool: concurrent.futures.Executor, e.g. a ProcessPoolExecutor with at least num_of_workers processes
+        :return: None
+        """
+        base = self.base
+        if base.process_pool_finalizer is not None:
+            base.process_pool_finalizer()
+            base.process_pool_finalizer = None
+        base.process_pool = pool
+        return None
+
+    def __get_process_pool(self, num_of_workers):
+        """
+        Returns the pool of processes of the ensemble, created with num_of_workers processes if there is none
+        :param num_of_workers: int - number of processes
+        :return: concurrent.futures.Executor
+        """
+        base = self.base
+        if base.process_pool is None:
+            base.process_pool = concurrent.futures.ProcessPoolExecutor(num_of_workers)
+            base.process_pool_finalizer = weakref.finalize(base, base.process_pool.shutdown)
+        return base.process_pool
+
+    @staticmethod
+    def __count_signatures_in_parallel(pool, nonempty, multiplicities, pairs, num_of_pairs, num_of_workers,
+                                       return_indices=False):
+        """
+        Returns the number of timestamps of every induced subgraph, computed by a pool of processes
+
+        The timestamps are split into num_of_workers ranges with the same number of timestamps, every process counts
+        the signatures of a range with count_signatures_of_pairs and the counts of the ranges are merged by signature.
+        :param pool: concurrent.futures.Executor - pool of processes, see use_process_pool
+        :param nonempty: numpy array of int - indices of the timestamps in increasing order
+        :param multiplicities: numpy array of int - number of timestamps represented by every timestamp, None for one
+        :param pairs: list of (position of the pair, bitset of the pair)
+        :param num_of_pairs: int - number of pairs of the node set
+        :param num_of_workers: int - number of processes
+        :param return_indices: boolean - True to also return the indices of the timestamps of every induced subgraph
+        :return: list of (index of the first timestamp, number of timestamps, signature of the induced subgraph) ordered
+                 by first timestamp, with return_indices the indices of the timestamps are appended to every tuple
+        """
+        ranges = [r for r in np.array_split(np.arange(len(nonempty)), num_of_workers) if len(r)]
+        merged = {}
+        futures = []
+        for r in ranges:
+            # the pair bitsets are shifted to the first timestamp of the range so that only the range is sent
+            start = int(nonempty[r[0]])
+            stop = int(nonempty[r[-1]]) + 1
+            range_mask = (1 << (stop - start)) - 1
+            range_pairs = [(q, bits >> start & range_mask) for q, bits in pairs]
+            futures.append((start, pool.submit(count_signatures_of_pairs, nonempty[r] - start,
+                                               None if multiplicities is None else multiplicities[r],
+                                               [(q, bits) for q, bits in range_pairs if bits], num_of_pairs,
+                                               stop - start, return_indices)))
+        # the ranges are merged in order, so the first timestamp of a signature is found in its first range
+        for start, future in futures:
+            for entry in future.result():
+                signature = entry[2]
+                if signature not in merged:
+                    merged[signature] = [entry[0] + start, 0, signature] + ([[]] if return_indices else [])
+                merged[signature][1] += entry[1]
+                if return_indices:
+                    merged[signature][3].append(entry[3] + start)
+        result = sorted(merged.values(), key=lambda entry: entry[0])
+        if return_indices:
+            return [(first, count, signature, np.concatenate(indices)) for first, count, signature, indices in result]
+        return [(first, count, signature) for first, count, signature in result]
+
     @staticmethod
     def is_matching_graph(g1, g2):
         """
@@ -188,52 +1152,521 @@ class Ensemble:
         :param graph: digraph
         :return: float
         """
-        return float(len(self.find_subgraph(graph))) / len(self)
+        return float(popcount(self.get_subgraph_bits(graph))) / len(self)
 
-    def compute_subgraph_divergence(self, nodes):
+    def compute_subgraph_divergence(self, nodes, num_of_workers=None):
         """
         Returns the subgraph divergence for the given set of nodes nodes
         :param nodes: list of nodes
+        :param num_of_workers: int - number of processes which count the induced subgraphs of ranges of timestamps,
+                               None to count them in this process
+        :return: float
+        """
+        # nodes which are not in the ensemble do not induce any edge
+        ids = [self.node_ids[v] for v in nodes if v in self.node_ids]
+        counts = self.get_subgraph_counts_of_ids(ids, num_of_workers=num_of_workers)
+        return Ensemble.compute_divergence_from_counts(len(nodes), counts, self.get_num_of_timestamps())
+
+    def compute_subgraph_divergence_of_ids(self, ids):
+        """
+        Returns the subgraph divergence for the given set of node ids
+        :param ids: list of node ids
+        :return: float
+        """
+        counts = self.get_subgraph_counts_of_ids(ids)
+        return Ensemble.compute_divergence_from_counts(len(ids), counts, self.get_num_of_timestamps())
+
+    def compute_scaled_subgraph_divergence_of_ids(self, ids):
+        """
+        Returns the scaled subgraph divergence for the given set of node ids
+        :param ids: list of node ids
+        :return: float (value <= 1)
+        """
+        return self.compute_subgraph_divergence_of_ids(ids) / Ensemble.compute_combinations(len(ids), 2)
+
+    def get_subgraph_counts_of_ids(self, ids, compute=True, num_of_workers=None):
+        """
+        Returns the number of non empty timestamps of every distinct subgraph induced by the given node ids, ordered by
+        first timestamp
+
+        The counts of recently used node sets are kept in an LRU cache keyed by the sorted node ids (see
+        get_cache_stats), and in the persistent store if the ensemble uses one (see use_store).
+        :param ids: list of node ids
+        :param compute: boolean - False to return None rather than count the subgraphs of a node set which is not cached
+        :param num_of_workers: int - number of processes which count the subgraphs, see
+                               __count_timestamps_by_induced_subgraph
+        :return: tuple of int
+        """
+        key = self.__get_subgraph_counts_key(ids)
+        counts = self.subgraph_counts.get(key)
+        persists = self.__persists_counts()
+        if counts is None and persists:
+            counts = self.store.get_counts(self.get_content_hash(), key)
+        if counts is None and compute:
+            counts = tuple(count for count, signature in self.__count_timestamps_by_induced_subgraph(key,
+                                                                                                  num_of_workers))
+            self.subgraph_counts.put(key, counts)
+            if persists:
+                self.store.put_counts(self.get_content_hash(), key, counts)
+        return counts
+
+    def put_subgraph_counts_of_ids(self, ids, counts):
+        """
+        Add the counts of the subgraphs induced by the given node ids to the cache and to the persistent store, see
+        get_subgraph_counts_of_ids
+        :param ids: list of node ids
+        :param counts: tuple of int - number of timestamps of every induced subgraph ordered by first timestamp
+        :return: None
+        """
+        key = self.__get_subgraph_counts_key(ids)
+        self.subgraph_counts.put(key, counts)
+        if self.__persists_counts():
+            self.store.put_counts(self.get_content_hash(), key, counts)
+
+    def get_subgraph_counts_of_labels(self, labels):
+        """
+        Returns the number of non empty timestamps of every class of the partitions given by labels, ordered by first
+        timestamp
+        :param labels: 2-D array of labels returned by compute_sd_batch or extend_sd_batch
+        :return: list of tuples of int, one per row of labels
+        """
+        labels = np.asarray(labels, dtype=np.int64)
+        num_of_sets, num_of_unique = labels.shape
+        if not num_of_unique:
+            return [()] * num_of_sets
+        indices, multiplicities = self.get_unique_snapshots()
+        keys = (np.arange(num_of_sets, dtype=np.int64)[:, None] * num_of_unique + labels).ravel()
+        counts = np.bincount(keys, weights=np.tile(multiplicities, num_of_sets),
+                             minlength=num_of_sets * num_of_unique).astype(np.int64)
+        first = np.full(num_of_sets * num_of_unique, num_of_unique, dtype=np.int64)
+        np.minimum.at(first, keys, np.tile(np.arange(num_of_unique, dtype=np.int64), num_of_sets))
+        # the count of every class at the position of its first timestamp, read row by row
+        by_first = np.zeros((num_of_sets, num_of_unique), dtype=np.int64)
+        present = np.flatnonzero(counts)
+        by_first[present // num_of_unique, first[present]] = counts[present]
+        rows, positions = np.nonzero(by_first)
+        counts = by_first[rows, positions].tolist()
+        bounds = np.searchsorted(rows, np.arange(num_of_sets + 1)).tolist()
+        return [tuple(counts[bounds[r]:bounds[r + 1]]) for r in range(num_of_sets)]
+
+    def use_store(self, filename):
+        """
+        Keeps the induced subgraph counts of the node sets computed by get_subgraph_counts_of_ids,
+        count_induced_subgraphs_of_ids and the DivergenceConstraint in a persistent store, so that other runs on the
+        same ensemble reuse them
+
+        Only the counts over at least DivergenceConstraint.CACHE_MIN_SNAPSHOTS distinct static graphs are kept, the
+        others are cheaper to count again than to read. The views of the ensemble created afterwards share the store,
+        which writes its last entries when it is closed (e.g. with ensemble.use_store(filename): ...), collected or
+        when the process exits.
+        :param filename: str - path of the store, see SubgraphCountStore
+        :return: SubgraphCountStore
+        """
+        self.store = SubgraphCountStore(filename)
+        return self.store
+
+    def __persists_counts(self):
+        """
+        Returns true if the induced subgraph counts of the ensemble are kept in the persistent store
+        :return: boolean
+        """
+        return self.store is not None and \
+            len(self.get_unique_snapshots()[0]) >= DivergenceConstraint.CACHE_MIN_SNAPSHOTS
+
+    def get_content_hash(self):
+        """
+        Returns a hash of the nodes, timestamps and static graphs covered by the ensemble
+        :return: str
+        """
+        key = (self.get_time_mask(), len(self.base.timestamps), self.base.num_of_edges, self.order())
+        if self.content_hash is None or self.content_hash[0] != key:
+            covered = list(iter_bits(self.get_time_mask()))
+            content = hashlib.sha1(repr(self.node_labels).encode())
+            content.update(repr([self.timestamps[i] for i in covered]).encode())
+            content.update(np.array([self.time_hashes[i] for i in covered], dtype=np.uint64).tobytes())
+            self.content_hash = (key, content.hexdigest())
+        return self.content_hash[1]
+
+    def __count_subgraphs_of_key(self, key, num_of_workers=None):
+        """
+        Returns the number of non empty timestamps at which each distinct subgraph is induced by the given sorted node
+        ids, from the persistent store if it holds them
+        :param key: tuple of sorted distinct node ids
+        :param num_of_workers: int - number of processes which count the subgraphs, None to count them in this process
+        :return: list of (number of timestamps, signature of the induced subgraph) ordered by first timestamp
+        """
+        if not self.__persists_counts():
+            return self.__count_timestamps_by_induced_subgraph(key, num_of_workers)
+        content_hash = self.get_content_hash()
+        counts = self.store.get(content_hash, key)
+        if counts is None:
+            counts = self.__count_timestamps_by_induced_subgraph(key, num_of_workers)
+            self.store.put(content_hash, key, counts)
+        return counts
+
+    def get_cache_stats(self):
+        """
+        Returns the hits, misses and evictions of the cache of induced subgraph counts and its number of entries and
+        memory, see LRUCache.get_stats
+        :return: dict
+        """
+        return self.subgraph_counts.get_stats()
+
+    def __get_subgraph_counts_key(self, ids):
+        """
+        Returns the key of the given node ids in the cache of induced subgraph counts, the cache is cleared if the
+        ensemble changed since it was filled
+        :param ids: list of node ids
+        :return: tuple of int
+        """
+        version = (len(self.base.timestamps), self.base.num_of_edges)
+        if version != self.subgraph_counts_version:
+            self.subgraph_counts.clear()
+            self.subgraph_counts_version = version
+        return tuple(sorted(set(ids)))
+
+    @staticmethod
+    def compute_divergence_from_counts(num_of_nodes, counts, num_of_timestamps):
+        """
+        Returns the subgraph divergence of a set of nodes from the number of timestamps at which each of its induced
+        subgraphs is present
+        :param num_of_nodes: int - size of the set of nodes
+        :param counts: list of int - number of timestamps for every distinct induced subgraph
+        :param num_of_timestamps: int
         :return: float
         """
         # We initialize the subgraph divergence with number of combinations for set nodes of size 2
-        subgraph_divergence = Ensemble.compute_combinations(len(nodes), 2)
-        induced_subgraphs_dict = self.find_subgraphs_induced_by_nodes(nodes)
-        probability_of_subgraphs = [float(len(timestamps)) / self.get_num_of_timestamps() for timestamps in
-                                    induced_subgraphs_dict.values()]
+        subgraph_divergence = Ensemble.compute_combinations(num_of_nodes, 2)
+        probability_of_subgraphs = [float(count) / num_of_timestamps for count in counts]
         for p in probability_of_subgraphs:
             if p > 0.0:
                 subgraph_divergence += p * math.log2(p)
         return subgraph_divergence
 
-    def compute_scaled_subgraph_divergence(self, nodes):
+    def compute_sd_batch(self, candidates, return_labels=False):
+        """
+        Returns the subgraph divergence of every row of candidates
+
+        All candidates are evaluated together with numpy: the signatures of the induced subgraphs of every candidate
+        at every representative of the distinct static graphs are packed into 64 bit words, every row is sorted to
+        count the timestamps of its distinct signatures and the entropy terms are summed in order of first timestamp,
+        so the result is the same as compute_subgraph_divergence_of_ids for each candidate.
+        :param candidates: 2-D array of int, every row holds the distinct node ids of a candidate of size k >= 2
+        :param return_labels: boolean - True to also return the partition of the timestamps of every candidate
+        :return: numpy array of float, and with return_labels a 2-D array whose row r labels every representative of
+                 the distinct static graphs (see get_unique_snapshots) with the class of its induced subgraph for
+                 candidates[r] (see extend_sd_batch)
+        """
+        candidates = np.asarray(candidates, dtype=np.int64)
+        first, second = np.triu_indices(candidates.shape[1], 1)
+        return self.__compute_sd_of_pairs(candidates, candidates[:, first], candidates[:, second], [],
+                                          candidates.shape[1], return_labels)
+
+    def extend_sd_batch(self, labels, parents, items, return_labels=False):
+        """
+        Returns the subgraph divergence of every node set parents[r] + [items[r]]
+
+        The subgraphs induced by the child are the subgraphs induced by the parent together with the edges between
+        the new node and the parent, so the partition of the timestamps of the child is the partition of the parent,
+        given by its labels, refined with the edges of the new node: only the k pairs of the new node are read instead
+        of the (k + 1)k/2 pairs of the child.
+        :param labels: 2-D array of int, row r holds the labels returned for parents[r] by compute_sd_batch or
+                       extend_sd_batch
+        :param parents: 2-D array of int, every row holds the distinct node ids of a node set of size k
+        :param items: array of int, items[r] is a node id which is not in parents[r]
+        :param return_labels: boolean - True to also return the labels of the children
+        :return: numpy array of float, and with return_labels the labels of the children
+        """
+        parents = np.asarray(parents, dtype=np.int64)
+        items = np.asarray(items, dtype=np.int64)
+        return self.__compute_sd_of_pairs(parents, np.repeat(items[:, None], parents.shape[1], axis=1), parents,
+                                          [np.asarray(labels)], parents.shape[1] + 1, return_labels)
+
+    def __compute_sd_of_pairs(self, rows, first, second, keys, num_of_nodes, return_labels):
+        """
+        Returns the subgraph divergence of node sets whose partition of timestamps is given by keys and the pairs
+        (first[r, q], second[r, q])
+        :param rows: 2-D array of int, one row per node set
+        :param first: 2-D array of int - node id of the first node of every pair
+        :param second: 2-D array of int - node id of the second node of every pair
+        :param keys: list of 2-D arrays of labels of the timestamps which refine the pairs (rows x representatives of
+                     the distinct static graphs, see get_unique_snapshots)
+        :param num_of_nodes: int - size of the node sets
+        :param return_labels: boolean - True to also return the labels of the partitions
+        :return: numpy array of float, and with return_labels a 2-D array of labels
+        """
+        unique_mask, indices, multiplicities, weights = self.__find_unique_snapshots()
+        num_of_nonempty = int(multiplicities.sum())
+        num_of_timestamps = self.get_num_of_timestamps()
+        # p * log2(p) for the probability of a subgraph present at count timestamps, computed as in
+        # compute_divergence_from_counts
+        terms = np.zeros(num_of_nonempty + 1)
+        for count in range(1, num_of_nonempty + 1):
+            p = float(count) / num_of_timestamps
+            terms[count] = p * math.log2(p)
+        divergences = np.full(len(rows), Ensemble.compute_combinations(num_of_nodes, 2))
+        return self.__sum_entropy_terms(first, second, keys, indices, multiplicities if weights is not None else None,
+                                        terms, divergences, return_labels)
+
+    def __sum_entropy_terms(self, first, second, keys, columns, multiplicities, terms, sums, return_labels):
+        """
+        Adds to sums[r] the entropy term of every class of the partition of the given timestamps by the subgraph
+        induced by the pairs (first[r, q], second[r, q]) and the labels keys
+
+        The terms are added left to right in order of the first timestamp of the classes.
+        :param first: 2-D array of int - node id of the first node of every pair
+        :param second: 2-D array of int - node id of the second node of every pair
+        :param keys: list of 2-D arrays of labels of the timestamps which refine the pairs (rows x columns)
+        :param columns: array of int - indices of the timestamps, which may repeat
+        :param multiplicities: array of int - number of timestamps represented by every column, None for one
+        :param terms: array of float - terms[c] is the term of a class of c timestamps
+        :param sums: array of float - initial value of the sums, one per row
+        :param return_labels: boolean - True to also return the labels of the partitions
+        :return: numpy array of float, and with return_labels a 2-D array (rows x columns) of labels
+        """
+        num_of_sets = len(sums)
+        labels = np.zeros((num_of_sets, len(columns)), dtype=np.int32)
+        if num_of_sets and len(columns):
+            nonempty_mask = self.get_nonempty_mask()
+            num_of_bytes = (len(self.timestamps) + 7) // 8
+            column_bytes = columns >> 3
+            column_bits = (columns & 7).astype(np.uint8)
+            num_of_pairs = first.shape[1]
+            num_of_words = (num_of_pairs + 63) // 64
+            shifts = (np.arange(num_of_pairs) % 64).astype(np.uint64)[None, :, None]
+            block_size = max(1, (1 << 20) // (max(num_of_pairs, 1) * max(len(columns), num_of_bytes)))
+            adj = self.adj
+            for start in range(0, num_of_sets, block_size):
+                stop = min(start + block_size, num_of_sets)
+                buffer = b''.join((adj[i1].get(i2, 0) & nonempty_mask).to_bytes(num_of_bytes, 'little')
+                                  for i1, i2 in zip(first[start:stop].ravel().tolist(),
+                                                    second[start:stop].ravel().tolist()))
+                bit_rows = np.frombuffer(buffer, dtype=np.uint8).reshape(stop - start, num_of_pairs, num_of_bytes)
+                present = ((bit_rows[:, :, column_bytes] >> column_bits) & 1).astype(np.uint64)
+                present <<= shifts
+                signatures = [key[start:stop] for key in keys]
+                signatures += [np.bitwise_or.reduce(present[:, 64 * word:64 * (word + 1)], axis=1)
+                               for word in range(num_of_words)]
+                # sort the signatures of every node set, np.lexsort is stable so every run starts at its first
+                # timestamp
+                order = np.lexsort(signatures[::-1], axis=-1)
+                signatures = [np.take_along_axis(signature, order, axis=1) for signature in signatures]
+                run_start = np.ones(order.shape, dtype=bool)
+                for signature in signatures:
+                    run_start[:, 1:] &= signature[:, 1:] == signature[:, :-1]
+                run_start[:, 1:] = ~run_start[:, 1:]
+                set_index, position = np.nonzero(run_start)
+                run_end = np.append(position[1:], 0)
+                run_end[np.append(set_index[1:] != set_index[:-1], True)] = len(columns)
+                if multiplicities is None:
+                    run_counts = run_end - position
+                else:
+                    # number of timestamps of every run from the cumulative multiplicities in sorted order
+                    cumulative = np.zeros((stop - start, len(columns) + 1), dtype=np.int64)
+                    np.cumsum(multiplicities[order], axis=1, out=cumulative[:, 1:])
+                    run_counts = cumulative[set_index, run_end] - cumulative[set_index, position]
+                # entropy term of every run at the position of its first timestamp, summed left to right after the
+                # initial value
+                summands = np.zeros((stop - start, len(columns) + 1))
+                summands[:, 0] = sums[start:stop]
+                summands[set_index, order[set_index, position] + 1] = terms[run_counts]
+                sums[start:stop] = np.cumsum(summands, axis=1)[:, -1]
+                if return_labels:
+                    np.put_along_axis(labels[start:stop], order, np.cumsum(run_start, axis=1, dtype=np.int32) - 1,
+                                      axis=1)
+        if return_labels:
+            return sums, labels
+        return sums
+
+    def compute_ssd_batch(self, candidates):
+        """
+        Returns the scaled subgraph divergence of every row of candidates
+        :param candidates: 2-D array of int, every row holds the distinct node ids of a candidate of size k >= 2
+        :return: numpy array of float (values <= 1)
+        """
+        candidates = np.asarray(candidates, dtype=np.int64)
+        return self.compute_sd_batch(candidates) / Ensemble.compute_combinations(candidates.shape[1], 2)
+
+    def estimate_ssd_batch(self, candidates, num_of_samples, confidence=0.95, seed=None):
+        """
+        Returns estimates of the scaled subgraph divergence of every row of candidates with confidence intervals
+
+        The entropy H of the distribution of the induced subgraphs over the non empty timestamps is estimated from a
+        sample of m = num_of_samples non empty timestamps drawn with replacement. The plug-in entropy Hs of the sample
+        underestimates H, the estimate is Hs + (K - 1) / (2 * m * ln(2)) (Miller-Madow correction) for the K distinct
+        subgraphs of the sample. Replacing one sampled timestamp changes Hs by at most (log2(m) + log2(e)) / m, so by
+        McDiarmid's inequality Hs is within e = (log2(m) + log2(e)) * sqrt(ln(2 / delta) / (2 * m)) of its expectation
+        with probability 1 - delta, and this expectation is between H - log2(1 + (N - 1) / m) and H (Paninski) for N
+        the number of possible subgraphs, at most the number of distinct static graphs. The interval is
+        [Hs - e, Hs + e + log2(1 + (N - 1) / m)], which holds for any distribution and is never empty: small samples
+        give wide intervals, whose candidates are evaluated exactly. The divergence follows from H.
+
+        Note: when num_of_samples is not smaller than the number of distinct non empty static graphs the divergence is
+        computed exactly and the interval is the divergence itself.
+        :param candidates: 2-D array of int, every row holds the distinct node ids of a candidate of size k >= 2
+        :param num_of_samples: int - number m of sampled timestamps
+        :param confidence: float - probability that the divergence of a candidate is in its interval
+        :param seed: int or numpy random Generator - seed of the random sample, None for a random seed
+        :return: numpy arrays of float: estimates, lower bounds, upper bounds
+        """
+        candidates = np.asarray(candidates, dtype=np.int64)
+        num_of_sets, k = candidates.shape
+        unique_mask, indices, multiplicities, weights = self.__find_unique_snapshots()
+        if num_of_samples >= len(indices):
+            divergences = self.compute_ssd_batch(candidates)
+            return divergences, divergences.copy(), divergences.copy()
+        m = num_of_samples
+        num_of_nonempty = int(multiplicities.sum())
+        # a distinct static graph is drawn with the probability of its timestamps
+        sample = np.random.default_rng(seed).choice(
+            indices, size=m, p=multiplicities / float(num_of_nonempty) if weights is not None else None)
+        first, second = np.triu_indices(k, 1)
+        sums, labels = self.__sum_entropy_terms(candidates[:, first], candidates[:, second], [], sample, None,
+                                                np.zeros(m + 1), np.zeros(num_of_sets), True)
+        # number of sampled timestamps of every subgraph, the labels of a row are 0..K-1
+        offsets = np.arange(num_of_sets, dtype=np.int64)[:, None] * m
+        counts = np.bincount((labels + offsets).ravel(), minlength=num_of_sets * m).reshape(num_of_sets, m)
+        p = counts / float(m)
+        entropies = -(p * np.log2(np.where(counts > 0, p, 1.0))).sum(axis=1)
+        corrections = ((counts > 0).sum(axis=1) - 1) / (2.0 * m * math.log(2))
+        # deviation of the plug-in entropy from its expectation (McDiarmid) and bias of its expectation (Paninski)
+        deviation = (math.log2(m) + math.log2(math.e)) * math.sqrt(math.log(2 / (1 - confidence)) / (2 * m))
+        num_of_subgraphs = min(len(indices), 2 ** len(first))
+        bias = math.log2(1 + (num_of_subgraphs - 1) / float(m))
+        max_entropy = min(len(first), math.log2(len(indices)))
+        lower_entropy = np.maximum(entropies - deviation, 0.0)
+        upper_entropy = np.minimum(entropies + deviation + bias, max_entropy)
+        entropies = np.minimum(entropies + corrections, max_entropy)
+        # H' = -sum(p * log2(p)) over the subgraphs, with p the probability among all the timestamps, is
+        # fraction * (H - log2(fraction)) for the fraction of non empty timestamps
+        fraction = float(num_of_nonempty) / self.get_num_of_timestamps()
+        combinations = Ensemble.compute_combinations(k, 2)
+        # the bounds of H' are not capped by C(k, 2), so the divergences are clipped to their range [0, 1]
+        estimates, lower, upper = [np.clip((combinations - fraction * (entropy - math.log2(fraction))) / combinations,
+                                           0.0, 1.0) for entropy in (entropies, upper_entropy, lower_entropy)]
+        return estimates, lower, upper
+
+    def estimate_scaled_subgraph_divergence(self, nodes, num_of_samples, confidence=0.95, seed=None):
+        """
+        Returns an estimate of the scaled subgraph divergence of the given nodes from a sample of timestamps and a
+        confidence interval, see estimate_ssd_batch
+        :param nodes: list of nodes
+        :param num_of_samples: int - number of sampled timestamps
+        :param confidence: float - probability that the scaled subgraph divergence is in the interval
+        :param seed: int - seed of the random sample, None for a random seed
+        :return: estimate, lower bound, upper bound
+        """
+        estimates, lower, upper = self.estimate_ssd_batch([[self.node_ids[v] for v in nodes]], num_of_samples,
+                                                          confidence, seed)
+        return estimates[0], lower[0], upper[0]
+
+    def compute_scaled_subgraph_divergence(self, nodes, num_of_workers=None):
         """
         Returns the subgraph divergence for the given set of nodes nodes
         :param nodes: list of nodes
+        :param num_of_workers: int - number of processes, see compute_subgraph_divergence
         :return: float (value <= 1)
         """
-        ssd = self.compute_subgraph_divergence(nodes) / Ensemble.compute_combinations(len(nodes), 2)
+        ssd = self.compute_subgraph_divergence(nodes, num_of_workers) / Ensemble.compute_combinations(len(nodes), 2)
         return ssd
 
+    def dynamic_node_set(self, nodes=()):
+        """
+        Returns a set of nodes whose subgraph divergence is updated as nodes are added and removed, see DynamicNodeSet
+        :param nodes: list of nodes
+        :return: DynamicNodeSet
+        """
+        return DynamicNodeSet(self, nodes)
+
     def maximal_phi_sd_ucs(self, phi):
-        return LevelwiseApriori.maximal_freq_itemsets(lambda x: self.compute_subgraph_divergence(x) <= phi,
-                                                      self.nodes(), AntiMonotone.generate_candidates)
+        return self.__mine(LevelwiseApriori.maximal_freq_itemsets, DivergenceConstraint(self, phi, scaled=False),
+                           AntiMonotone.generate_candidates)
 
     def phi_sd_ucs(self, phi):
-        return LevelwiseApriori.freq_itemsets((lambda x: self.compute_subgraph_divergence(x) <= phi), self.nodes(),
-                                              AntiMonotone.generate_candidates)
+        return self.__mine(LevelwiseApriori.freq_itemsets, DivergenceConstraint(self, phi, scaled=False),
+                           AntiMonotone.generate_candidates)
 
-    def maximal_sigma_ssd_ucs(self, sigma):
-        return LevelwiseApriori.maximal_freq_itemsets(lambda x: self.compute_scaled_subgraph_divergence(x) <= sigma,
-                                                      self.nodes(), AntiMonotone.generate_candidates)
+    def maximal_sigma_ssd_ucs(self, sigma, num_of_samples=None, confidence=0.999, seed=None, cliques=False):
+        """
+        Returns the maximal sigma-SSD UCs
+        :param sigma: float
+        :param num_of_samples: int - number of sampled timestamps to screen the candidates, see DivergenceConstraint
+        :param confidence: float - confidence of the intervals of the sampled estimates
+        :param seed: int - seed of the samples
+        :param cliques: boolean - True to extend the UCs as cliques of the graph of the sigma-SSD pairs, see
+                        CliqueAntiMonotone
+        :return: list of tuples of nodes
+        """
+        return self.__mine(LevelwiseApriori.maximal_freq_itemsets,
+                           DivergenceConstraint(self, sigma, True, num_of_samples, confidence, seed),
+                           CliqueAntiMonotone().generate_candidates if cliques else AntiMonotone.generate_candidates)
 
-    def sigma_ssd_ucs(self, sigma):
-        return LevelwiseApriori.freq_itemsets(lambda x: self.compute_scaled_subgraph_divergence(x) <= sigma,
-                                              self.nodes(), AntiMonotone.generate_candidates)
+    def sigma_ssd_ucs(self, sigma, num_of_samples=None, confidence=0.999, seed=None):
+        return self.__mine(LevelwiseApriori.freq_itemsets,
+                           DivergenceConstraint(self, sigma, True, num_of_samples, confidence, seed),
+                           AntiMonotone.generate_candidates)
 
-    def maximal_lam_sigma_ssd_ucs(self, sigma):
-        return LevelwiseApriori.maximal_freq_itemsets(lambda x: self.compute_scaled_subgraph_divergence(x) <= sigma,
-                                                      self.nodes(), LooselyAntiMonotone.generate_candidates)
+    def maximal_lam_sigma_ssd_ucs(self, sigma, num_of_samples=None, confidence=0.999, seed=None):
+        return self.__mine(LevelwiseApriori.maximal_freq_itemsets,
+                           DivergenceConstraint(self, sigma, True, num_of_samples, confidence, seed),
+                           LooselyAntiMonotone.generate_candidates)
+
+    def __mine(self, mine, constraint, generate_candidates):
+        """
+        Returns the UCs found by the levelwise algorithm and keeps the pruning statistics of the constraint
+        :param mine: LevelwiseApriori.freq_itemsets or LevelwiseApriori.maximal_freq_itemsets
+        :param constraint: DivergenceConstraint
+        :param generate_candidates: AntiMonotone.generate_candidates or LooselyAntiMonotone.generate_candidates
+        :return: list of tuples of nodes
+        """
+        itemsets = mine(constraint, self.get_sorted_node_ids(), generate_candidates)
+        self.pruning_stats = constraint.get_stats()
+        return self.__label_itemsets(itemsets)
+
+    def sliding_window_maximal_sigma_ssd_ucs(self, sigma, width, step=1,
+                                             generate_candidates=AntiMonotone.generate_candidates):
+        """
+        Yields the maximal sigma-SSD UCs of every window of width consecutive timestamps, moving step timestamps at a
+        time
+
+        The node sets are evaluated with a WindowedDivergence: the node sets evaluated in a window keep the number of
+        timestamps of each of their induced subgraphs, which is updated with the timestamps which enter and leave the
+        window, so only the node sets which were not evaluated in the previous window are counted.
+        :param sigma: float
+        :param width: int - number of timestamps in a window
+        :param step: int - number of timestamps between the starts of consecutive windows
+        :param generate_candidates: AntiMonotone.generate_candidates or LooselyAntiMonotone.generate_candidates
+        :return: generator of (list of timestamps of the window in chronological order, list of UCs)
+        """
+        windowed = WindowedDivergence(self, sigma)
+        for start in range(0, max(len(self) - width, 0) + 1, step):
+            window = self.window(start, width)
+            windowed.move(window)
+            ucs = LevelwiseApriori.maximal_freq_itemsets(windowed, self.get_sorted_node_ids(), generate_candidates)
+            windowed.evict_unused()
+            window.pruning_stats = windowed.get_stats()
+            yield window.get_sorted_timestamps(), self.__label_itemsets(ucs)
+
+    def get_sorted_node_ids(self):
+        """
+        Returns the list of all node ids, the items mined by the levelwise algorithm, in the order of their nodes
+
+        The loosely anti-monotone search extends the itemsets with the items in this order, which decides the parents
+        of its candidates; the ids are in the order the nodes were added if the nodes cannot be sorted.
+        :return: list of int
+        """
+        try:
+            return sorted(range(self.order()), key=self.node_labels.__getitem__)
+        except TypeError:
+            return list(range(self.order()))
+
+    def __label_itemsets(self, itemsets):
+        """
+        Returns the itemsets of node ids as sorted tuples of nodes
+        :param itemsets: list of tuples of node ids
+        :return: list of tuples of nodes
+        """
+        return [tuple(sorted(self.get_node_labels(itemset))) for itemset in itemsets]
 
     def generate_antimonotone_hyperedges_report(self, sigma):
         """
@@ -276,8 +1709,80 @@ class Ensemble:
 
     @staticmethod
     def compute_combinations(n, r):
-        f = math.factorial
-        return f(n) / f(r) / f(n - r)
+        """
+        Returns the number of subsets of r elements of a set of n elements
+
+        The binomial coefficient is computed exactly with integers, as the quotient of the factorials does not fit a
+        float above 170 nodes.
+        :param n: int
+        :param r: int
+        :return: float
+        """
+        if r < 0 or r > n:
+            return 0.0
+        if r == 2:
+            # the number of pairs of a node set, computed for every evaluated candidate
+            return float(n * (n - 1) // 2)
+        combinations = 1
+        for i in range(min(r, n - r)):
+            combinations = combinations * (n - i) // (i + 1)
+        return float(combinations)
+
+
+def count_signatures_of_pairs(nonempty, multiplicities, pairs, num_of_pairs, num_of_timestamps, return_indices=False):
+    """
+    Returns the number of timestamps of every subgraph induced by a node set, computed with numpy
+
+    The pair bitsets are unpacked into a pair-by-timestamp 0/1 matrix, the signature of every timestamp is packed into
+    64 bit words and the distinct signatures are counted with np.unique. The function is at module level so that it can
+    run in the processes of Ensemble.__count_signatures_in_parallel.
+    :param nonempty: numpy array of int - indices of the timestamps
+    :param multiplicities: numpy array of int - number of timestamps represented by every timestamp, None for one
+    :param pairs: list of (position of the pair, bitset of the pair)
+    :param num_of_pairs: int - number of pairs of the node set
+    :param num_of_timestamps: int - number of bits of the pair bitsets
+    :param return_indices: boolean - True to also return the indices of the timestamps of every induced subgraph
+    :return: list of (index of the first timestamp, number of timestamps, signature of the induced subgraph) ordered by
+             first timestamp, with return_indices the indices of the timestamps are appended to every tuple
+    """
+    if not len(nonempty):
+        return []
+    num_of_bytes = (num_of_timestamps + 7) // 8
+    num_of_words = max(1, (num_of_pairs + 63) // 64)
+    signatures = np.zeros((num_of_words, len(nonempty)), dtype=np.uint64)
+    if pairs:
+        bit_rows = np.frombuffer(b''.join(bits.to_bytes(num_of_bytes, 'little') for q, bits in pairs),
+                                 dtype=np.uint8).reshape(len(pairs), -1)
+        positions = np.array([q for q, bits in pairs], dtype=np.uint64)
+        words = positions >> np.uint64(6)
+        # one word at a time, so that at most 64 pairs are unpacked at once
+        for word in np.unique(words).tolist():
+            in_word = words == word
+            present = np.unpackbits(bit_rows[in_word], axis=1, bitorder='little')[:, nonempty].astype(np.uint64)
+            present <<= (positions[in_word] & np.uint64(63))[:, None]
+            signatures[word] = np.bitwise_or.reduce(present, axis=0)
+    if num_of_words == 1:
+        unique, first, inverse, counts = np.unique(signatures[0], return_index=True, return_inverse=True,
+                                                   return_counts=True)
+        unique = unique[:, None]
+    else:
+        unique, first, inverse, counts = np.unique(signatures.T, axis=0, return_index=True, return_inverse=True,
+                                                   return_counts=True)
+    inverse = inverse.ravel()
+    if return_indices:
+        # indices of the timestamps of every signature, grouped by signature in increasing order
+        grouped = np.split(nonempty[np.argsort(inverse, kind='stable')], np.cumsum(counts)[:-1])
+    if multiplicities is not None:
+        counts = np.bincount(inverse, weights=multiplicities, minlength=len(unique)).astype(np.int64)
+    # the signature of every row of 64 bit words, little endian
+    words = np.ascontiguousarray(unique, dtype='<u8').tobytes()
+    width = 8 * unique.shape[1]
+    result = []
+    for k in np.argsort(first).tolist():
+        signature = int.from_bytes(words[k * width:(k + 1) * width], 'little')
+        entry = (int(nonempty[first[k]]), int(counts[k]), signature)
+        result.append(entry + (grouped[k],) if return_indices else entry)
+    return result
 
 
 def list_to_tab_seperated_string(l):
@@ -286,6 +1791,78 @@ def list_to_tab_seperated_string(l):
         result += ('%s\t' % i)
     return result.rstrip()
 
+
+def parse_timestamp(t):
+    """
+    Returns the typed value of timestamp t
+
+    Integers and numbers are parsed as int and float, dates such as '2004-09', '2004-09-30' or '2004-09-30 12:00:00'
+    as datetime. Any other timestamp is returned as it is.
+    :param t: timestamp (int, float or str)
+    :return: int, float, datetime or t
+    """
+    if not isinstance(t, str):
+        return t
+    for parse in (int, float):
+        try:
+            return parse(t)
+        except ValueError:
+            pass
+    for date_format in ('%Y-%m', '%Y-%m-%d', '%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S'):
+        try:
+            return datetime.datetime.strptime(t, date_format)
+        except ValueError:
+            pass
+    return t
+
+
+def timestamp_sort_key(t):
+    """
+    Returns the key which orders timestamps chronologically: numbers before dates before other strings
+    :param t: timestamp
+    :return: tuple
+    """
+    t = parse_timestamp(t)
+    if isinstance(t, datetime.datetime):
+        return 1, t
+    if isinstance(t, str):
+        return 2, t
+    return 0, t
+
+
+def unique_with_first_index(a):
+    """
+    Returns the sorted unique values of a, the index of their first occurrence and the index of every value of a in
+    them, same as np.unique(a, return_index=True, return_inverse=True)
+
+    Byte strings of at most 8 bytes are sorted as the big endian ints of their bytes, which compare like the strings
+    and sort much faster.
+    :param a: 1d numpy array
+    :return: numpy array of values, numpy array of int, numpy array of int
+    """
+    keys = a
+    if a.dtype.kind == 'S' and a.dtype.itemsize <= 8:
+        words = np.zeros((len(a), 8), dtype=np.uint8)
+        words[:, :a.dtype.itemsize] = np.ascontiguousarray(a).view(np.uint8).reshape(len(a), a.dtype.itemsize)
+        keys = words.view('>u8').ravel()
+    keys, inverse = np.unique(keys, return_inverse=True)
+    inverse = inverse.ravel()
+    first = np.full(len(keys), len(a), dtype=np.int64)
+    np.minimum.at(first, inverse, np.arange(len(a)))
+    return a[first], first, inverse
+
+
+def decode(a):
+    """
+    Returns the array a with byte strings decoded to str
+    :param a: numpy array
+    :return: numpy array
+    """
+    if a.dtype.kind == 'S':
+        return np.char.decode(a, 'utf-8')
+    return a
+
+
 def frange(x, y, jump):
   while x < y:
     yield x
@@ -0,0 +1,169 @@
+import numpy as np
+
+__author__ = 'adb'
+
+
+class ItemsetArray:
+    """
+    Itemsets of one level of the levelwise algorithm, all of the same size, held in a lexicographically sorted array
+
+    The items are non negative int32 stored big endian, so the bytes of a row compare like the row: every row is also a
+    fixed size key and the subset checks are binary searches of these keys. The candidates of the next level are
+    generated by a sort-merge join of the rows which share their first size - 1 items. It has the methods of
+    ItemsetTrie, which holds the levels of the items which do not fit (see fits).
+    """
+
+    # largest item of an itemset, the items are stored as int32
+    MAX_ITEM = (1 << 31) - 1
+
+    def __init__(self, itemsets, size):
+        """
+        :param itemsets: iterable of sorted tuples of size items or array of shape (number of itemsets, size), the items
+                          are ints in [0, 2^31)
+        :param size: int - number of items of the itemsets of the level
+        """
+        self.size = size
+        itemsets = np.asarray(itemsets)
+        if itemsets.size and not ItemsetArray.fits(itemsets.ravel()):
+            # casting to int32 would wrap the items around or truncate them silently
+            raise ValueError('the items of an ItemsetArray must be ints in [0, 2^31), use an ItemsetTrie for other '
+                             'items')
+        keys = ItemsetArray.__keys(itemsets.astype('>i4').reshape(-1, size))
+        # the keys are sorted and unique, the rows are a view of them
+        self.keys = np.unique(keys)
+        self.itemsets = self.keys.view('>i4').reshape(-1, size)
+
+    @staticmethod
+    def fits(items):
+        """
+        Returns true if the items are ints in [0, 2^31), which an ItemsetArray can hold
+        :param items: list of items
+        :return: boolean
+        """
+        items = np.asarray(items)
+        if items.dtype.kind not in 'iu' or items.ndim != 1:
+            return False
+        return len(items) == 0 or (int(items.min()) >= 0 and int(items.max()) <= ItemsetArray.MAX_ITEM)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __iter__(self):
+        return iter(ItemsetArray.rows_to_tuples(self.itemsets))
+
+    def contains(self, itemsets):
+        """
+        Returns which of the given itemsets are in the array
+        :param itemsets: array of shape (number of itemsets, size) of sorted itemsets
+        :return: numpy array of bool
+        """
+        queries = ItemsetArray.__keys(itemsets)
+        if len(self.keys) == 0:
+            return np.zeros(len(queries), dtype=bool)
+        index = np.minimum(np.searchsorted(self.keys, queries), len(self.keys) - 1)
+        return self.keys[index] == queries
+
+    def contained_in(self, supersets):
+        """
+        Returns which itemsets of the array are contained in an itemset of supersets
+        :param supersets: ItemsetArray of the itemsets with one more item
+        :return: numpy array of bool
+        """
+        subsets = ItemsetArray(np.concatenate([np.delete(supersets.itemsets, i, axis=1)
+                                               for i in range(supersets.size)]), self.size)
+        return subsets.contains(self.itemsets)
+
+    def first_parents_in(self, supersets, items):
+        """
+        Returns which itemsets of the array are the first parent of an itemset of supersets, the subset in the array
+        without the first of its items in the order of items
+        :param supersets: ItemsetArray of the itemsets with one more item
+        :param items: list of all the items, in the order in which they extend the itemsets
+        :return: numpy array of bool
+        """
+        rows = supersets.itemsets
+        ranks = np.zeros(max(items) + 1 if len(items) else 0, dtype=np.int64)
+        ranks[items] = np.arange(len(items))
+        # column of every superset of the first parent found so far, the subsets are checked by rank of their item
+        first = np.full(len(rows), -1)
+        first_rank = np.full(len(rows), len(items))
+        for i in range(supersets.size):
+            rank = ranks[rows[:, i]]
+            earlier = (rank < first_rank) & self.contains(np.delete(rows, i, axis=1))
+            first[earlier] = i
+            first_rank[earlier] = rank[earlier]
+        rows = rows[first >= 0]
+        kept = np.ones(rows.shape, dtype=bool)
+        kept[np.arange(len(rows)), first[first >= 0]] = False
+        selected = np.zeros(len(self.keys), dtype=bool)
+        selected[np.searchsorted(self.keys, ItemsetArray.__keys(rows[kept].reshape(-1, self.size)))] = True
+        return selected
+
+    def join(self):
+        """
+        Returns the unions of the pairs of itemsets which share their first size - 1 items, in lexicographic order
+
+        Every union is generated once, from the two subsets without one of its last two items.
+        :return: numpy array of shape (number of unions, size + 1)
+        """
+        n = len(self.keys)
+        if n == 0:
+            return np.empty((0, self.size + 1), dtype=self.itemsets.dtype)
+        starts = np.ones(n, dtype=bool)
+        starts[1:] = np.any(self.itemsets[1:, :-1] != self.itemsets[:-1, :-1], axis=1)
+        group_start = np.flatnonzero(starts)
+        group_end = np.append(group_start[1:], n)
+        # every itemset is joined with the following itemsets of its group
+        num_of_pairs = group_end[np.cumsum(starts) - 1] - np.arange(n) - 1
+        left = np.repeat(np.arange(n), num_of_pairs)
+        right = left + 1 + np.arange(len(left)) - np.repeat(np.cumsum(num_of_pairs) - num_of_pairs, num_of_pairs)
+        unions = np.empty((len(left), self.size + 1), dtype=self.itemsets.dtype)
+        unions[:, :-1] = self.itemsets[left]
+        unions[:, -1] = self.itemsets[right, -1]
+        return unions
+
+    def join_candidates(self):
+        """
+        Returns the unions of the pairs of itemsets which share their first size - 1 items and whose subsets of size
+        items are all in the array (Apriori-gen), in lexicographic order
+        :return: list of tuples of size + 1 items
+        """
+        unions = self.join()
+        # the joined itemsets are the subsets without one of the last two items, the others are checked with the keys
+        frequent = np.ones(len(unions), dtype=bool)
+        for i in range(self.size - 1):
+            frequent &= self.contains(np.delete(unions, i, axis=1))
+        return ItemsetArray.rows_to_tuples(unions[frequent])
+
+    def to_tuples(self, selected=None):
+        """
+        Returns the itemsets of the array as tuples of items
+        :param selected: numpy array of bool - the itemsets returned, all of them if None
+        :return: list of tuples of int
+        """
+        itemsets = self.itemsets if selected is None else self.itemsets[selected]
+        return ItemsetArray.rows_to_tuples(itemsets)
+
+    @staticmethod
+    def rows_to_tuples(rows):
+        """
+        Returns the rows of a 2-D array of items as tuples of ints
+
+        The columns are converted to lists and zipped: converting the rows to lists allocates a list per row, which
+        about doubles the time as the garbage collector scans them.
+        :param rows: numpy array of shape (number of itemsets, size)
+        :return: list of tuples of int
+        """
+        if rows.shape[1] == 0:
+            return [()] * len(rows)
+        return list(zip(*[column.tolist() for column in rows.T]))
+
+    @staticmethod
+    def __keys(itemsets):
+        """
+        Returns the rows of the itemsets as keys which compare like the rows
+        :param itemsets: array of shape (number of itemsets, size) of non negative items
+        :return: numpy array of void
+        """
+        itemsets = np.ascontiguousarray(itemsets, dtype='>i4')
+        return itemsets.view(np.dtype((np.void, 4 * itemsets.shape[1]))).ravel()
@@ -0,0 +1,186 @@
+__author__ = 'adb'
+
+
+class ItemsetTrie:
+    """
+    Prefix trie of the itemsets of one level of the levelwise algorithm, all of the same size
+
+    Every itemset is a sorted tuple of items and is the path from the root to a leaf. The trie answers whether all the
+    subsets of a candidate one item larger are in the level and whether an itemset one or more items smaller has a
+    superset in the level by walking the shared prefixes, without building the subsets.
+
+    The levels of items which are ints in [0, 2^31) are held in an ItemsetArray, which has the same methods computed
+    with numpy; the trie holds the levels of any other sortable, hashable items.
+    """
+
+    def __init__(self, itemsets, size):
+        """
+        :param itemsets: iterable of sorted tuples of size items
+        :param size: int - number of items of the itemsets of the level
+        """
+        self.size = size
+        self.root = {}
+        self.num_of_itemsets = 0
+        for itemset in itemsets:
+            self.add(itemset)
+
+    def __len__(self):
+        return self.num_of_itemsets
+
+    def __iter__(self):
+        return self.__iter_paths(self.root, (), self.size)
+
+    def __contains__(self, itemset):
+        return len(itemset) == self.size and self.__find(self.root, itemset, 0) is not None
+
+    def add(self, itemset):
+        """
+        Add the itemset to the trie
+        :param itemset: sorted tuple of size items
+        :return: None
+        """
+        node = self.root
+        for item in itemset[:-1]:
+            node = node.setdefault(item, {})
+        if itemset[-1] not in node:
+            node[itemset[-1]] = {}
+            self.num_of_itemsets += 1
+        return None
+
+    def prefix_groups(self):
+        """
+        Yields the prefixes of size - 1 items shared by the itemsets with the sorted last items of these itemsets
+        :return: generator of (tuple of items, list of items)
+        """
+        for prefix in self.__iter_paths(self.root, (), self.size - 1):
+            last_items = self.__find(self.root, prefix, 0)
+            if last_items:
+                yield prefix, sorted(last_items)
+
+    def join_candidates(self):
+        """
+        Returns the unions of the pairs of itemsets which share their first size - 1 items and whose subsets of size
+        items are all in the trie (Apriori-gen), in lexicographic order
+        :return: list of tuples of size + 1 items
+        """
+        unions = []
+        for prefix, last_items in self.prefix_groups():
+            for i, x in enumerate(last_items):
+                for y in last_items[i + 1:]:
+                    union = prefix + (x, y)
+                    if self.has_all_subsets(union):
+                        unions.append(union)
+        return unions
+
+    def contained_in(self, supersets):
+        """
+        Returns which itemsets of the trie, in the order of iteration, are contained in an itemset of supersets
+        :param supersets: ItemsetTrie of the itemsets with one more item
+        :return: list of boolean
+        """
+        return [supersets.has_superset(itemset) for itemset in self]
+
+    def first_parents_in(self, supersets, items):
+        """
+        Returns which itemsets of the trie, in the order of iteration, are the first parent of an itemset of supersets,
+        the subset in the trie without the first of its items in the order of items
+        :param supersets: ItemsetTrie of the itemsets with one more item
+        :param items: list of all the items, in the order in which they extend the itemsets
+        :return: list of boolean
+        """
+        ranks = dict((item, rank) for rank, item in enumerate(items))
+        parents = set()
+        for itemset in supersets:
+            subsets = [(ranks[item], itemset[:i] + itemset[i + 1:]) for i, item in enumerate(itemset)]
+            found = [(rank, subset) for rank, subset in subsets if subset in self]
+            if found:
+                parents.add(min(found, key=lambda x: x[0])[1])
+        return [itemset in parents for itemset in self]
+
+    def to_tuples(self, selected=None):
+        """
+        Returns the itemsets of the trie as tuples of items
+        :param selected: list of boolean - the itemsets returned in the order of iteration, all of them if None
+        :return: list of tuples
+        """
+        if selected is None:
+            return list(self)
+        return [itemset for itemset, chosen in zip(self, selected) if chosen]
+
+    def has_all_subsets(self, itemset):
+        """
+        Returns True if all the subsets of the itemset with one item less are in the trie
+        :param itemset: sorted tuple of size + 1 items
+        :return: boolean
+        """
+        # path[i] is the node of the prefix of i items, the subset without item i continues from it
+        path = [self.root]
+        for item in itemset[:-1]:
+            node = path[-1].get(item)
+            if node is None:
+                return False
+            path.append(node)
+        for i in range(len(itemset) - 2, -1, -1):
+            if self.__find(path[i], itemset, i + 1) is None:
+                return False
+        return True
+
+    def has_superset(self, itemset):
+        """
+        Returns True if an itemset of the trie contains the given itemset
+        :param itemset: sorted tuple of at most size items
+        :return: boolean
+        """
+        return ItemsetTrie.__has_superset(self.root, itemset, 0, self.size - len(itemset))
+
+    @staticmethod
+    def __has_superset(node, itemset, start, num_of_skips):
+        """
+        Returns True if a path below node contains the items of itemset from start, skipping at most num_of_skips items
+        :param node: dict - node of the trie
+        :param itemset: sorted tuple of items
+        :param start: int - index of the first item of itemset not matched yet
+        :param num_of_skips: int - number of items of the path which are not in itemset
+        :return: boolean
+        """
+        if num_of_skips == 0:
+            return ItemsetTrie.__find(node, itemset, start) is not None
+        if start == len(itemset):
+            return bool(node)
+        item = itemset[start]
+        child = node.get(item)
+        if child is not None and ItemsetTrie.__has_superset(child, itemset, start + 1, num_of_skips):
+            return True
+        # the items of the path are sorted, only the items smaller than the next item of itemset can be skipped
+        return any(ItemsetTrie.__has_superset(child, itemset, start, num_of_skips - 1)
+                   for other, child in node.items() if other < item)
+
+    @staticmethod
+    def __find(node, itemset, start):
+        """
+        Returns the node reached from node by the items of itemset from start, None if there is no such path
+        :param node: dict - node of the trie
+        :param itemset: sorted tuple of items
+        :param start: int - index of the first item of the path
+        :return: dict
+        """
+        for i in range(start, len(itemset)):
+            node = node.get(itemset[i])
+            if node is None:
+                return None
+        return node
+
+    @staticmethod
+    def __iter_paths(node, prefix, depth):
+        """
+        Yields the paths of depth items below node
+        :param node: dict - node of the trie
+        :param prefix: tuple of the items from the root to node
+        :param depth: int
+        :return: generator of tuples of items
+        """
+        if depth == 0:
+            yield prefix
+            return
+        for item, child in node.items():
+            yield from ItemsetTrie.__iter_paths(child, prefix + (item,), depth - 1)
@@ -0,0 +1,95 @@
+import collections
+import sys
+
+__author__ = 'adb'
+
+
+class LRUCache:
+    """
+    Dict like cache bounded by the approximate memory of its entries which evicts the least recently used entries first
+
+    The memory of an entry is the size of its key and value as given by sys.getsizeof, plus the size of the elements
+    of a key or value which is a tuple, e.g. the node ids and the counts of the induced subgraphs. The ints from -5 to
+    256 are shared by python and are not counted.
+    """
+
+    def __init__(self, max_bytes):
+        """
+        :param max_bytes: int - memory cap of the entries, 0 disables the cache
+        """
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()
+        self.num_of_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        """
+        Returns the value of key and marks it as the most recently used, default if key is not in the cache
+        :param key: hashable
+        :param default: value returned on a miss
+        :return: value
+        """
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value[0]
+
+    def put(self, key, value):
+        """
+        Add key with the given value to the cache and evicts the least recently used entries above the memory cap
+        :param key: hashable
+        :param value: value, not None
+        :return: None
+        """
+        size = LRUCache.__sizeof(key) + LRUCache.__sizeof(value)
+        if size > self.max_bytes:
+            return None
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.num_of_bytes -= old[1]
+        self.entries[key] = (value, size)
+        self.num_of_bytes += size
+        while self.num_of_bytes > self.max_bytes:
+            key, (value, size) = self.entries.popitem(last=False)
+            self.num_of_bytes -= size
+            self.evictions += 1
+        return None
+
+    def clear(self):
+        """
+        Removes all the entries, the counters are kept
+        :return: None
+        """
+        self.entries.clear()
+        self.num_of_bytes = 0
+
+    def get_stats(self):
+        """
+        Returns the number of hits, misses and evictions, the number of entries and their memory
+        :return: dict
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'entries': len(self.entries),
+                'bytes': self.num_of_bytes}
+
+    @staticmethod
+    def __sizeof(obj):
+        """
+        Returns the memory of obj and of its elements if it is a tuple, except the small ints which python shares
+        :param obj: object
+        :return: int
+        """
+        size = sys.getsizeof(obj)
+        if isinstance(obj, tuple):
+            size += sum(sys.getsizeof(x) for x in obj if not (isinstance(x, int) and -5 <= x <= 256))
+        return size
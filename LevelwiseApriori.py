@@ -1,6 +1,9 @@
 __author__ = 'adb'
 
 import itertools
+import numpy as np
+from ItemsetArray import ItemsetArray
+from ItemsetTrie import ItemsetTrie
 
 class LevelwiseApriori:
     """
@@ -15,37 +18,47 @@ class LevelwiseApriori:
         :param items: list of singleton items
         :return: list of itemsets
         """
-        output, deletes = LevelwiseApriori.__compute_freq_itemsets(constraint, items, generate_candidates)
-        return output
+        levels, maximal = LevelwiseApriori.__compute_freq_itemsets(constraint, items, generate_candidates)
+        return set(itertools.chain.from_iterable(level.to_tuples() for level in levels))
 
     @staticmethod
     def __compute_freq_itemsets(constraint, items, generate_candidates):
         """
-        Returns list of all frequent itemsets which satisfy the given constraint and also returns the itemsets which do not satisfy the maximality constraint
+        Returns the levels of all frequent itemsets which satisfy the given constraint and also returns which itemsets
+        of every level satisfy the maximality constraint
         :param constraint: function which return boolean value
         :param items: list of singleton items
-        :return: list of itemsets
+        :return: list of ItemsetArray or ItemsetTrie, list of numpy arrays of bool
         """
-        support_data = {}
-        output = set()
-        # deletes is used to mark the deletes
-        deletes = set()
+        # the frequent itemsets are kept in their levels, held in sorted int32 arrays when the items fit them and in
+        # tries otherwise, and are only converted to tuples when they are returned
+        levels = []
+        # maximal[k] marks the itemsets of levels[k] which are not contained in an itemset of the next level
+        maximal = []
+        level_type = ItemsetArray if ItemsetArray.fits(items) else ItemsetTrie
+        # a candidate of the loosely anti-monotone generation only marks its first parent as not maximal, the others
+        # mark all their subsets
+        first_parents = getattr(generate_candidates, 'first_parents', False)
 
         # S is the current candidate set
         S = LevelwiseApriori.__generate_initial_candidate(items, constraint)
         # print('Size of S = %d, Size of output = %d' % (len(S), len(output)))
         while len(S) > 0:
-            T = set()
-            for U in S:
-                U = tuple(sorted(list(U)))
-                output.add(U)
-                T.add(U)
-                if U in support_data:
-                    for parent in support_data[U]:
-                        deletes.add(parent)
-            S, support_data = generate_candidates(T, constraint, items)
-            # print('Size of T = %d, Size of S = %d, Size of output = %d, Size of deletes = %d' % (len(T), len(S), len(output), len(deletes)))
-        return output, deletes
+            # the candidates are sorted tuples of items
+            level = level_type(S, len(S[0]))
+            if levels:
+                # T is the previous level
+                T = levels[-1]
+                deletes = T.first_parents_in(level, items) if first_parents else T.contained_in(level)
+                maximal[-1] = ~np.asarray(deletes, dtype=bool)
+            levels.append(level)
+            maximal.append(np.ones(len(level), dtype=bool))
+            if hasattr(constraint, 'can_extend') and not constraint.can_extend():
+                # no candidate of the next level can satisfy the constraint
+                break
+            S = generate_candidates(level, constraint, items)
+            # print('Size of T = %d, Size of S = %d, Size of output = %d' % (len(T), len(S), len(output)))
+        return levels, maximal
 
     @staticmethod
     def maximal_freq_itemsets(constraint, items, generate_candidates):
@@ -55,8 +68,9 @@ class LevelwiseApriori:
         :param items: list of singleton items
         :return: list of itemsets
         """
-        output, deletes = LevelwiseApriori.__compute_freq_itemsets(constraint, items, generate_candidates)
-        return [x for x in output if x not in deletes]
+        levels, maximal = LevelwiseApriori.__compute_freq_itemsets(constraint, items, generate_candidates)
+        return list(itertools.chain.from_iterable(level.to_tuples(selected)
+                                                  for level, selected in zip(levels, maximal)))
 
     @staticmethod
     def __generate_initial_candidate(items, constraint):
@@ -65,7 +79,22 @@ class LevelwiseApriori:
         :param items: list of singleton items
         :return: list of list of nodes
         """
-        return [tuple(sorted(list(U))) for U in LevelwiseApriori.find_subsets(items, 2) if constraint(list(U))]
+        candidates = LevelwiseApriori.find_subsets(sorted(items), 2)
+        return LevelwiseApriori.filter_candidates(candidates, constraint)
+
+    @staticmethod
+    def filter_candidates(candidates, constraint):
+        """
+        Returns the candidates which satisfy the given constraint
+
+        Constraints with an evaluate_many method (e.g. DivergenceConstraint) evaluate all the candidates at once
+        :param candidates: list of tuples of items
+        :param constraint: function which return boolean value
+        :return: list of tuples of items
+        """
+        if hasattr(constraint, 'evaluate_many'):
+            return [U for U, satisfied in zip(candidates, constraint.evaluate_many(candidates)) if satisfied]
+        return [U for U in candidates if constraint(list(U))]
 
     @staticmethod
     def find_subsets(S, m):
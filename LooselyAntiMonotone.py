@@ -1,3 +1,4 @@
+import bisect
 from LevelwiseApriori import LevelwiseApriori
 
 __author__ = 'adb'
@@ -7,26 +8,28 @@ class LooselyAntiMonotone:
     @staticmethod
     def generate_candidates(k_freq_itemsets, constraint, items):
         """
-        Returns set of candidates with k + 1 nodes using set of candidates with k nodes and also returns support data which contains the parent child relationship.
-        :param k_freq_itemsets: List of frequent itemsets of size k
+        Returns list of candidates with k + 1 nodes using the frequent itemsets with k nodes.
+        :param k_freq_itemsets: ItemsetArray or ItemsetTrie of the frequent itemsets of size k
         :param constraint: function which returns boolean value
         :param items: list of singleton items in the dataset
-        :return: List of candidates of size k+1, dictionary of support data with child -> parent mapping
+        :return: List of candidates of size k+1
         """
-        candidates = set()
-        support_data = {}
-        for a in items:
-            for b in k_freq_itemsets:
-                k = len(b)
-                union = tuple(sorted(set(b).union({a})))
-                if len(union) == k + 1 and constraint(list(union)):
-                    if union not in candidates:
-                        candidates.add(union)
-                        if union not in support_data:
-                            support_data[tuple(union)] = [b]
-                        else:
-                            support_data[tuple(union)].extend([b])
-        # returning set of candidates with k + 1 nodes
-        return list(candidates), support_data
+        items = sorted(items)
+        unions = {}
+        for b in k_freq_itemsets:
+            # the items between b[j - 1] and b[j] are inserted at position j, which keeps the union sorted without
+            # building and sorting a set
+            start = 0
+            for j in range(len(b) + 1):
+                stop = bisect.bisect_left(items, b[j]) if j < len(b) else len(items)
+                prefix, suffix = b[:j], b[j:]
+                for a in items[start:stop]:
+                    unions[prefix + (a,) + suffix] = None
+                start = stop + 1
+        # the constraint is evaluated once per candidate
+        return LevelwiseApriori.filter_candidates(list(unions), constraint)
 
 
+# the parent of a candidate is the subset without the first of its items in the order of the items, as the candidates
+# are generated by extending the frequent itemsets with every item in turn: only this parent is not maximal
+LooselyAntiMonotone.generate_candidates.first_parents = True
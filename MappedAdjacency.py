@@ -0,0 +1,117 @@
+import numpy as np
+
+__author__ = 'adb'
+
+
+class MappedAdjacency:
+    """
+    Read-mostly adjacency of an ensemble backed by (memory-mapped) numpy arrays
+
+    The neighbours of node i are neighbors[indptr[i]:indptr[i + 1]] in increasing order and the timestamp bitset of the
+    edge to neighbors[k] is the packed bit row edge_bits[rows[k]]. Only the rows which are looked up are read from disk.
+    Edges and nodes added after loading are kept in memory. It is the adjacency of the ensembles loaded out of core,
+    with Ensemble.load(dirname, mmap_mode).
+    """
+
+    def __init__(self, indptr, neighbors, rows, edge_bits):
+        self.indptr = indptr
+        self.neighbors = neighbors
+        self.rows = rows
+        self.edge_bits = edge_bits
+        self.num_of_mapped_nodes = len(indptr) - 1
+        # node id -> dict of neighbour id -> bitset for edges changed after loading
+        self.overlay = {}
+        # neighbour dicts of the nodes added after loading
+        self.extra = []
+
+    def __len__(self):
+        return self.num_of_mapped_nodes + len(self.extra)
+
+    def __getitem__(self, i):
+        if i >= self.num_of_mapped_nodes:
+            return self.extra[i - self.num_of_mapped_nodes]
+        return MappedNeighbors(self, i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def append(self, neighbors):
+        """
+        Add a new node with the given neighbour dict
+        :param neighbors: dict {neighbour id: bitset}
+        :return: None
+        """
+        self.extra.append(neighbors)
+
+    def get_mapped_bits(self, i, j):
+        """
+        Returns the bitset of the edge between i and j stored in the arrays, None if there is no such edge
+        :param i: int - node id
+        :param j: int - node id
+        :return: int or None
+        """
+        lo, hi = self.indptr[i], self.indptr[i + 1]
+        k = lo + np.searchsorted(self.neighbors[lo:hi], j)
+        if k < hi and self.neighbors[k] == j:
+            return int.from_bytes(self.edge_bits[self.rows[k]].tobytes(), 'little')
+        return None
+
+    def get_mapped_neighbors(self, i):
+        """
+        Returns the neighbour ids of node i stored in the arrays
+        :param i: int - node id
+        :return: list of int
+        """
+        return self.neighbors[self.indptr[i]:self.indptr[i + 1]].tolist()
+
+
+class MappedNeighbors:
+    """
+    Dict like view {neighbour id: bitset} of the neighbours of a node in a MappedAdjacency
+    """
+
+    def __init__(self, adjacency, i):
+        self.adjacency = adjacency
+        self.i = i
+
+    def get(self, j, default=None):
+        overlay = self.adjacency.overlay.get(self.i)
+        if overlay is not None and j in overlay:
+            return overlay[j]
+        bits = self.adjacency.get_mapped_bits(self.i, j)
+        return default if bits is None else bits
+
+    def __getitem__(self, j):
+        bits = self.get(j)
+        if bits is None:
+            raise KeyError(j)
+        return bits
+
+    def __setitem__(self, j, bits):
+        self.adjacency.overlay.setdefault(self.i, {})[j] = bits
+
+    def update(self, entries):
+        self.adjacency.overlay.setdefault(self.i, {}).update(entries)
+
+    def __contains__(self, j):
+        return self.get(j) is not None
+
+    def keys(self):
+        overlay = self.adjacency.overlay.get(self.i, {})
+        return [j for j in self.adjacency.get_mapped_neighbors(self.i) if j not in overlay] + list(overlay)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        adjacency = self.adjacency
+        overlay = adjacency.overlay.get(self.i, {})
+        lo, hi = adjacency.indptr[self.i], adjacency.indptr[self.i + 1]
+        items = [(j, int.from_bytes(adjacency.edge_bits[row].tobytes(), 'little'))
+                 for j, row in zip(adjacency.neighbors[lo:hi].tolist(), adjacency.rows[lo:hi].tolist())
+                 if j not in overlay]
+        return items + list(overlay.items())
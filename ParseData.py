@@ -13,15 +13,7 @@ CONSTRAINT = sys.argv[3]
 
 
 
-with open(INPUTFILE, 'r') as f:
-    T = Ensemble()
-    for line in f:
-        line = line.strip()
-        timestamp, v1, v2 = line.split('\t', 2)
-        if v1 != v2:
-            T.add_edge(timestamp, v1, v2)
-        else:
-            T.add_node(v1)
+T = Ensemble.open_tsv(INPUTFILE)
 
 # if CONSTRAINT == 'am':
 #     T.generate_antimonotone_hyperedges_report(SIGMA)
@@ -22,9 +22,20 @@ def compute_percentage_of_nodes_covered(nodes, num_of_nodes):
             cummulitive_nodes.insert(i, list(set(cummulitive_nodes[i-1]).union(set(nodes[i]))))
     return [float(100*len(cummulitive_nodes[i]))/num_of_nodes for i in range(len(cummulitive_nodes))]
 
-def compute_ssd_of_remaining_nodes(nodes_in_ucs, ensemble):
-    rem_nodes = set(ensemble.nodes()).difference(set(nodes_in_ucs))
-    return ensemble.compute_scaled_subgraph_divergence(list(rem_nodes))
+def compute_ssd_of_remaining_nodes(nodes_in_ucs, remaining_nodes):
+    """
+    Returns the SSD of the nodes which are not in the given UC
+    :param nodes_in_ucs: list of nodes
+    :param remaining_nodes: DynamicNodeSet of all the nodes of the ensemble, it is left unchanged
+    :return: float
+    """
+    removed = [v for v in set(nodes_in_ucs) if v in remaining_nodes]
+    for v in removed:
+        remaining_nodes.remove(v)
+    ssd = remaining_nodes.compute_scaled_subgraph_divergence()
+    for v in removed:
+        remaining_nodes.add(v)
+    return ssd
 
 def plot_ssd_vs_rank(max_rank):
     with open(am_results_folder + '/top-' + str(max_rank) + '-hyperedges.tsv', 'r') as f:
@@ -61,8 +72,10 @@ def plot_percent_of_nodes_vs_rank(max_rank, num_of_nodes):
 def plot_ssd_of_uncovered_nodes_vs_rank(max_rank, T):
     with open(am_results_folder + '/top-' + str(max_rank) + '-hyperedges.tsv', 'r') as f:
         am_ssds = [line.split('\t')[-1] for line in f]
+    remaining_nodes = T.dynamic_node_set(T.nodes())
     with open(am_results_folder + '/top-' + str(max_rank) + '-hyperedges.tsv', 'r') as f:
-        am_rem_ssds = [compute_ssd_of_remaining_nodes(line.split('\t')[:-1], T) for line in f]
+        am_rem_ssds = [compute_ssd_of_remaining_nodes([int(v) for v in line.split('\t')[:-1]], remaining_nodes)
+                       for line in f]
     print(am_rem_ssds)
     plt.plot([i for i in range(1, len(am_ssds)+1)], am_ssds, label='UCs')
     plt.plot([i for i in range(1, len(am_rem_ssds)+1)], am_rem_ssds, label='Remaining Nodes')
@@ -130,26 +143,19 @@ def plot_num_of_k_size_ucs_vs_ssd_cutoff_for_lam(ssd_range):
     return size_map_for_ssd_range
 
 
-with open(graph_summary_file, 'r') as f:
-    for line in f:
-        line = line.strip()
-        summary = line.split('\t', 4)
-        num_of_timestamps, num_of_nodes, min_num_of_edges, max_num_of_edges, total_num_of_edges = int(summary[0]), int(summary[1]), int(summary[2]), int(summary[3]), int(summary[4])
+if __name__ == '__main__':
+    with open(graph_summary_file, 'r') as f:
+        for line in f:
+            line = line.strip()
+            summary = line.split('\t', 4)
+            num_of_timestamps, num_of_nodes, min_num_of_edges, max_num_of_edges, total_num_of_edges = int(summary[0]), int(summary[1]), int(summary[2]), int(summary[3]), int(summary[4])
 
-with open(datafile, 'r') as f:
-    T = Ensemble()
-    for line in f:
-        line = line.strip()
-        timestamp, v1, v2 = line.split('\t', 2)
-        if v1 != v2:
-            T.add_edge(timestamp, int(v1), int(v2))
-        else:
-            T.add_node(int(v1))
+    T = Ensemble.open_tsv(datafile, node_type=int)
 
-plot_ssd_vs_rank(128)
-# plot_percent_of_nodes_vs_rank(1024, num_of_nodes)
-# plot_ssd_of_uncovered_nodes_vs_rank(2048, T)
-# print(plot_num_of_k_size_ucs_vs_ssd_cutoff_for_am([0.1, 0.2, 0.3, 0.4, 0.5, 0.6]))
-# print(plot_num_of_k_size_ucs_vs_ssd_cutoff_for_lam([0.1, 0.2, 0.3, 0.4,  0.5, 0.6]))
+    plot_ssd_vs_rank(128)
+    # plot_percent_of_nodes_vs_rank(1024, num_of_nodes)
+    # plot_ssd_of_uncovered_nodes_vs_rank(2048, T)
+    # print(plot_num_of_k_size_ucs_vs_ssd_cutoff_for_am([0.1, 0.2, 0.3, 0.4, 0.5, 0.6]))
+    # print(plot_num_of_k_size_ucs_vs_ssd_cutoff_for_lam([0.1, 0.2, 0.3, 0.4,  0.5, 0.6]))
 
-plt.show()
\ No newline at end of file
+    plt.show()
@@ -0,0 +1,203 @@
+import array
+import sqlite3
+import weakref
+
+__author__ = 'adb'
+
+
+class SubgraphCountStore:
+    """
+    Persistent store of the induced subgraph counts of node sets, shared by the runs and the scripts which open the
+    same file
+
+    The counts are kept in an sqlite database keyed by the content hash of the ensemble (see Ensemble.get_content_hash)
+    and the sorted node ids, so the counts of an ensemble whose edges or timestamps changed are not found. An entry of
+    the table subgraph_counts is the list of (number of timestamps, signature) of the induced subgraphs of the node set
+    ordered by first timestamp, from which both the divergences and the distributions of the induced subgraphs follow.
+    An entry of the table count_arrays only holds the numbers of timestamps, packed as 64 bit ints, which is all the
+    divergences need (see put_counts and get_counts); the entries of a dataset are read at once by the first
+    get_counts on it, so the entries written by other runs afterwards are not seen.
+
+    New entries are written in batches of FLUSH_SIZE and when the store is closed: by close, at the end of a with
+    block, or when the store is garbage collected or the process exits.
+    """
+
+    # number of new entries written to the database at once
+    FLUSH_SIZE = 1000
+
+    def __init__(self, filename):
+        """
+        :param filename: str - path of the sqlite database, created if it does not exist
+        """
+        self.filename = filename
+        self.connection = sqlite3.connect(filename, timeout=60)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS subgraph_counts (dataset TEXT NOT NULL, '
+                                'nodes TEXT NOT NULL, counts TEXT NOT NULL, PRIMARY KEY (dataset, nodes)) '
+                                'WITHOUT ROWID')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS count_arrays (dataset TEXT NOT NULL, '
+                                'nodes TEXT NOT NULL, counts BLOB NOT NULL, PRIMARY KEY (dataset, nodes)) '
+                                'WITHOUT ROWID')
+        self.connection.commit()
+        # entries which are not written yet, with signatures and packed without them
+        self.pending = {}
+        self.pending_arrays = {}
+        # dataset -> {nodes: packed counts} of the entries of count_arrays
+        self.arrays = {}
+        self.hits = 0
+        self.misses = 0
+        self.finalizer = weakref.finalize(self, SubgraphCountStore.__write_and_close, self.connection, self.pending,
+                                          self.pending_arrays)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def get(self, dataset, ids):
+        """
+        Returns the induced subgraph counts of the node set, None if they are not in the store
+        :param dataset: str - content hash of the ensemble
+        :param ids: tuple of sorted node ids
+        :return: list of (number of timestamps, signature of the induced subgraph) ordered by first timestamp
+        """
+        counts = self.__read(dataset, SubgraphCountStore.__encode(ids))
+        if counts is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return counts
+
+    def get_counts(self, dataset, ids):
+        """
+        Returns the number of timestamps of every induced subgraph of the node set, None if they are not in the store
+        :param dataset: str - content hash of the ensemble
+        :param ids: tuple of sorted node ids
+        :return: tuple of int ordered by first timestamp
+        """
+        nodes = SubgraphCountStore.__encode(ids)
+        packed = self.pending_arrays.get((dataset, nodes))
+        if packed is None:
+            if dataset not in self.arrays:
+                self.arrays[dataset] = dict(self.connection.execute(
+                    'SELECT nodes, counts FROM count_arrays WHERE dataset = ?', (dataset,)) if self.connection else [])
+            packed = self.arrays[dataset].get(nodes)
+        counts = None if packed is None else tuple(array.array('q', packed))
+        if counts is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return counts
+
+    def put(self, dataset, ids, counts):
+        """
+        Add the induced subgraph counts of the node set to the store
+        :param dataset: str - content hash of the ensemble
+        :param ids: tuple of sorted node ids
+        :param counts: list of (number of timestamps, signature of the induced subgraph) ordered by first timestamp
+        :return: None
+        """
+        self.pending[(dataset, SubgraphCountStore.__encode(ids))] = counts
+        if len(self.pending) >= SubgraphCountStore.FLUSH_SIZE:
+            self.flush()
+        return None
+
+    def put_counts(self, dataset, ids, counts):
+        """
+        Add the number of timestamps of every induced subgraph of the node set to the store, unless it holds them
+        :param dataset: str - content hash of the ensemble
+        :param ids: tuple of sorted node ids
+        :param counts: tuple of int ordered by first timestamp
+        :return: None
+        """
+        nodes = SubgraphCountStore.__encode(ids)
+        if nodes in self.arrays.get(dataset, ()):
+            return None
+        self.pending_arrays[(dataset, nodes)] = array.array('q', counts).tobytes()
+        if len(self.pending_arrays) >= SubgraphCountStore.FLUSH_SIZE:
+            self.flush()
+        return None
+
+    def flush(self):
+        """
+        Writes the new entries to the database
+        :return: None
+        """
+        for (dataset, nodes), packed in self.pending_arrays.items():
+            if dataset in self.arrays:
+                self.arrays[dataset][nodes] = packed
+        if self.connection is not None:
+            SubgraphCountStore.__write(self.connection, self.pending, self.pending_arrays)
+        return None
+
+    def close(self):
+        """
+        Writes the new entries and closes the database
+        :return: None
+        """
+        self.finalizer()
+        self.connection = None
+        return None
+
+    def get_stats(self):
+        """
+        Returns the number of hits and misses of the store
+        :return: dict
+        """
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def __read(self, dataset, nodes):
+        """
+        Returns the entry of subgraph_counts of the node set, None if it is not in the store
+        :param dataset: str - content hash of the ensemble
+        :param nodes: str - key of the node set, see __encode
+        :return: list of (number of timestamps, signature of the induced subgraph) ordered by first timestamp
+        """
+        counts = self.pending.get((dataset, nodes))
+        if counts is None and self.connection is not None:
+            row = self.connection.execute('SELECT counts FROM subgraph_counts WHERE dataset = ? AND nodes = ?',
+                                          (dataset, nodes)).fetchone()
+            if row is not None:
+                counts = [tuple(int(x) for x in entry.split(':')) for entry in row[0].split(',') if entry]
+        return counts
+
+    @staticmethod
+    def __write(connection, pending, pending_arrays):
+        """
+        Writes the pending entries to the database and empties them
+        :param connection: sqlite3 connection
+        :param pending: dict {(dataset, nodes): list of (number of timestamps, signature)}
+        :param pending_arrays: dict {(dataset, nodes): packed numbers of timestamps}
+        :return: None
+        """
+        if pending or pending_arrays:
+            connection.executemany('INSERT OR REPLACE INTO subgraph_counts VALUES (?, ?, ?)',
+                                   [(dataset, nodes, ','.join('%d:%d' % entry for entry in counts))
+                                    for (dataset, nodes), counts in pending.items()])
+            connection.executemany('INSERT OR REPLACE INTO count_arrays VALUES (?, ?, ?)',
+                                   [(dataset, nodes, packed) for (dataset, nodes), packed in pending_arrays.items()])
+            connection.commit()
+            pending.clear()
+            pending_arrays.clear()
+
+    @staticmethod
+    def __write_and_close(connection, pending, pending_arrays):
+        """
+        Writes the pending entries and closes the connection, called once by close or when the store is collected
+        :param connection: sqlite3 connection
+        :param pending: dict of the entries of subgraph_counts which are not written yet
+        :param pending_arrays: dict of the entries of count_arrays which are not written yet
+        :return: None
+        """
+        SubgraphCountStore.__write(connection, pending, pending_arrays)
+        connection.close()
+
+    @staticmethod
+    def __encode(ids):
+        """
+        Returns the key of the node ids in the database
+        :param ids: tuple of int
+        :return: str
+        """
+        return ','.join(str(i) for i in ids)
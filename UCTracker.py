@@ -0,0 +1,126 @@
+import functools
+from LevelwiseApriori import LevelwiseApriori
+from AntiMonotone import AntiMonotone
+from WindowedDivergence import WindowedDivergence
+
+__author__ = 'adb'
+
+
+class UCTracker:
+    """
+    Keeps the maximal sigma-SSD UCs of an ensemble up to date while snapshots are appended to it
+
+    The tracker keeps the number of timestamps of each induced subgraph of the node sets evaluated at the last update
+    (see WindowedDivergence), so an update only adds the appended snapshots to these counts and counts the node sets
+    which were not evaluated before. It also keeps the candidates generated from every level of the last update: a
+    level which has the same itemsets at the next update only has its candidates evaluated again from their counts,
+    and the candidates are only generated from the levels whose itemsets changed, which are the levels after the first
+    node set whose status changed.
+    """
+
+    def __init__(self, ensemble, sigma, generate_candidates=AntiMonotone.generate_candidates):
+        """
+        :param ensemble: Ensemble - snapshots are appended to it with append_snapshot
+        :param sigma: float
+        :param generate_candidates: AntiMonotone.generate_candidates or LooselyAntiMonotone.generate_candidates, which
+                                    generate the candidates of a level from this level only
+        """
+        self.ensemble = ensemble
+        self.sigma = sigma
+        self.generate_candidates = generate_candidates
+        self.divergence = WindowedDivergence(ensemble, sigma)
+        self.ucs = set()
+        self.items = []
+        # levels of the last update -> the candidates generated from them
+        self.candidates = {}
+        # candidates of the current update, and the node sets last passed to evaluate_many
+        self.generated = {}
+        self.evaluated = []
+        self.update()
+
+    def get_ucs(self):
+        """
+        Returns the current maximal sigma-SSD UCs
+        :return: list of tuples of nodes
+        """
+        return self.__label_itemsets(self.ucs)
+
+    def append_snapshot(self, timestamp, edges, nodes=()):
+        """
+        Appends a snapshot to the ensemble (see Ensemble.append_snapshot) and updates the UCs
+        :param timestamp: timestamp of the snapshot
+        :param edges: list of (v1, v2) edges of the static graph
+        :param nodes: list of nodes without any edge to add to the ensemble
+        :return: list of UCs which entered the maximal set, list of UCs which left it
+        """
+        self.ensemble.append_snapshot(timestamp, edges, nodes)
+        return self.update()
+
+    def update(self):
+        """
+        Updates the UCs with the snapshots added to the ensemble since the last update
+        :return: list of UCs which entered the maximal set, list of UCs which left it
+        """
+        self.divergence.move(self.ensemble)
+        items = self.ensemble.get_sorted_node_ids()
+        if items != self.items:
+            # the candidates of the levels depend on the items
+            self.items = items
+            self.candidates = {}
+        generate_candidates = functools.partial(self.__generate_candidates)
+        generate_candidates.first_parents = getattr(self.generate_candidates, 'first_parents', False)
+        self.generated = {}
+        ucs = set(LevelwiseApriori.maximal_freq_itemsets(self, items, generate_candidates))
+        self.candidates = self.generated
+        self.generated = {}
+        self.evaluated = []
+        self.divergence.evict_unused()
+        self.ensemble.pruning_stats = self.divergence.get_stats()
+        entered = self.__label_itemsets(ucs - self.ucs)
+        left = self.__label_itemsets(self.ucs - ucs)
+        self.ucs = ucs
+        return entered, left
+
+    def evaluate_many(self, itemsets):
+        """
+        Returns for every node set whether it satisfies the constraint, see WindowedDivergence.evaluate_many
+        :param itemsets: list of tuples of node ids
+        :return: list of boolean
+        """
+        self.evaluated = itemsets
+        return self.divergence.evaluate_many(itemsets)
+
+    def can_extend(self):
+        """
+        Returns false if no node set which extends a node set of the last level satisfies the constraint
+        :return: boolean
+        """
+        return self.divergence.can_extend()
+
+    def __generate_candidates(self, level, constraint, items):
+        """
+        Returns the candidates generated from a level which satisfy the constraint, reusing the candidates of the same
+        level at the last update
+        :param level: ItemsetArray or ItemsetTrie of the frequent itemsets of size k
+        :param constraint: the tracker
+        :param items: list of node ids
+        :return: list of candidates of size k + 1
+        """
+        key = tuple(level)
+        candidates = self.candidates.get(key)
+        if candidates is None:
+            self.evaluated = []
+            satisfied = self.generate_candidates(level, constraint, items)
+            candidates = self.evaluated
+        else:
+            satisfied = LevelwiseApriori.filter_candidates(candidates, constraint)
+        self.generated[key] = candidates
+        return satisfied
+
+    def __label_itemsets(self, itemsets):
+        """
+        Returns the itemsets of node ids as sorted tuples of nodes
+        :param itemsets: iterable of tuples of node ids
+        :return: list of tuples of nodes
+        """
+        return sorted(tuple(sorted(self.ensemble.get_node_labels(itemset))) for itemset in itemsets)
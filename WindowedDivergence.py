@@ -0,0 +1,417 @@
+import math
+import numpy as np
+from BitSet import iter_bits, popcount
+from DivergenceConstraint import DivergenceConstraint
+from DynamicNodeSet import DynamicNodeSet
+
+__author__ = 'adb'
+
+
+class WindowedDivergence:
+    """
+    Constraint of the levelwise search on the subgraph divergence over a window of timestamps which moves along an
+    ensemble, or over an ensemble to which snapshots are appended
+
+    For every node set it has evaluated, it keeps the number of non empty timestamps of the window at which each
+    distinct subgraph is induced, identified by its Zobrist hash (see DynamicNodeSet), and the sum of
+    count * log2(count) over these classes, from which the divergence follows in O(1). When the window moves, the
+    subgraph induced by every kept node set at a timestamp which leaves the window is subtracted from its counts and
+    the one at a timestamp which enters it is added, instead of counting the subgraphs of the whole window again. The
+    node sets which were not evaluated before are counted over the distinct static graphs of the window, and all the
+    node sets are forgotten when more timestamps enter and leave the window than it has distinct static graphs.
+
+    The classes of all the node sets are held in one array of keys, the hash of the subgraph XOR a pseudo random salt
+    of the node set, kept sorted to find the class of a subgraph with a binary search. Distinct classes get the same
+    key with probability about 2^-64 per pair of classes.
+
+    The node sets whose divergence from the counts is within EPSILON of the threshold are evaluated exactly with
+    Ensemble.compute_sd_batch, so the result is the same as mining every window. A class of c timestamps of a node
+    set of size k is split by a new node into at most min(2^k, c) classes, so the entropy of its children is at most
+    H + sum(c / T * min(k, log2(c))): node sets which were not evaluated before are rejected without being counted when
+    this bound of one of their parents is too small, and can_extend tells the levelwise search when no child of the
+    last level can satisfy the constraint.
+    """
+
+    def __init__(self, ensemble, threshold, scaled=True):
+        """
+        :param ensemble: Ensemble - the windows are views of it
+        :param threshold: float - phi for the subgraph divergence, sigma for the scaled subgraph divergence
+        :param scaled: boolean - True to bound the scaled subgraph divergence
+        """
+        self.ensemble = ensemble
+        self.threshold = threshold
+        self.scaled = scaled
+        self.window = None
+        self.time_mask = 0
+        self.nonempty_mask = 0
+        # Zobrist hash of the static graph of every timestamp of the ensemble at the last move
+        self.time_hashes = []
+        self.next_salt = 0
+        self.__clear()
+        self.num_of_counted = 0
+        self.num_of_evaluated = 0
+        self.num_of_pruned_by_bound = 0
+        self.num_of_pruned_by_counts = 0
+        self.num_of_pruned_levels = 0
+
+    def __clear(self):
+        """
+        Forgets all the node sets and their classes
+        :return: None
+        """
+        # node sets -> row, keys[row] is the node set of a row
+        self.rows = {}
+        self.keys = []
+        self.sizes = np.empty(0, dtype=np.int64)
+        self.salts = np.empty(0, dtype=np.uint64)
+        # sum of count * log2(count) over the classes of every row
+        self.sums = np.empty(0)
+        # rows used since the last call to evict_unused
+        self.used = np.empty(0, dtype=bool)
+        # sorted keys of the classes with their number of timestamps and row
+        self.class_keys = np.empty(0, dtype=np.uint64)
+        self.class_counts = np.empty(0, dtype=np.int64)
+        self.class_rows = np.empty(0, dtype=np.int64)
+        # rows of the node sets which satisfied the constraint at the last call to evaluate_many
+        self.frontier = np.empty(0, dtype=np.int64)
+        # pairs of the rows of every size, see __groups
+        self.groups = None
+
+    def __call__(self, ids):
+        """
+        Returns true if the node set satisfies the constraint in the current window
+        :param ids: list of node ids
+        :return: boolean
+        """
+        return self.evaluate_many([tuple(ids)])[0]
+
+    def get_stats(self):
+        """
+        Returns the number of node sets counted over the window, evaluated exactly, rejected by the entropy bound of
+        their parents and from their counts, and the number of levels which can_extend found empty, since the last move
+        :return: dict
+        """
+        return {'counted': self.num_of_counted, 'evaluated': self.num_of_evaluated,
+                'pruned_by_bound': self.num_of_pruned_by_bound, 'pruned_by_counts': self.num_of_pruned_by_counts,
+                'pruned_levels': self.num_of_pruned_levels}
+
+    def move(self, window):
+        """
+        Moves the window to the timestamps of the given view of the ensemble
+        :param window: Ensemble - view returned by slice or window, or the ensemble itself
+        :return: None
+        """
+        time_mask = window.get_time_mask()
+        nonempty_mask = window.get_nonempty_mask()
+        time_hashes = self.ensemble.time_hashes
+        # only the non empty timestamps have classes
+        leaving = self.nonempty_mask & ~nonempty_mask
+        entering = nonempty_mask & ~self.nonempty_mask
+        if not time_mask & self.time_mask or any(time_hashes[i] != self.time_hashes[i]
+                                                  for i in iter_bits(self.time_mask)):
+            # the windows do not overlap, or the static graphs of timestamps which were counted have changed
+            self.__clear()
+        elif popcount(leaving | entering) >= popcount(window.get_unique_mask()):
+            # counting the node sets again over the distinct static graphs of the window is cheaper
+            self.__clear()
+        else:
+            columns = list(iter_bits(leaving | entering))
+            weights = np.array([-1 if leaving >> t & 1 else 1 for t in columns], dtype=np.int64)
+            columns = np.array(columns, dtype=np.int64)
+            for rows, first, second, pair_keys in self.__groups():
+                self.__add_columns(rows, self.__hashes(first, second, pair_keys, columns), weights)
+            kept = self.class_counts > 0
+            self.class_keys = self.class_keys[kept]
+            self.class_counts = self.class_counts[kept]
+            self.class_rows = self.class_rows[kept]
+        self.window = window
+        self.time_mask = time_mask
+        self.nonempty_mask = nonempty_mask
+        self.time_hashes = list(time_hashes)
+        self.frontier = np.empty(0, dtype=np.int64)
+        self.num_of_counted = 0
+        self.num_of_evaluated = 0
+        self.num_of_pruned_by_bound = 0
+        self.num_of_pruned_by_counts = 0
+        self.num_of_pruned_levels = 0
+
+    def can_extend(self):
+        """
+        Returns false if no node set which extends a node set of the last level by one node satisfies the constraint
+        :return: boolean
+        """
+        if not len(self.frontier):
+            return True
+        size = int(self.sizes[self.frontier[0]]) + 1
+        if self.__violates(size, self.__entropy_bounds(self.frontier).max()):
+            self.num_of_pruned_levels += 1
+            return False
+        return True
+
+    def evaluate_many(self, itemsets):
+        """
+        Returns for every node set whether it satisfies the constraint in the current window
+
+        The node sets which satisfy the constraint are the last level checked by can_extend.
+        :param itemsets: list of tuples of node ids
+        :return: list of boolean
+        """
+        rows = [self.rows.get(itemset, -1) for itemset in itemsets]
+        unknown = [k for k, row in enumerate(rows) if row < 0]
+        if unknown:
+            # a node set is rejected if the entropy bound of one of its parents is too small, and counted otherwise
+            bounds = np.append(self.__entropy_bounds(), np.inf)
+            counted = []
+            by_size = {}
+            for k in unknown:
+                by_size.setdefault(len(itemsets[k]), []).append(k)
+            for size, positions in by_size.items():
+                # the row -1 of the parents which have no row selects the infinite bound
+                parents = np.array([[self.rows.get(itemset[:j] + itemset[j + 1:], -1) for j in range(size)]
+                                    for itemset in [itemsets[k] for k in positions]], dtype=np.int64)
+                violated = self.__violates(size, bounds[parents].min(axis=1))
+                self.num_of_pruned_by_bound += int(violated.sum())
+                counted += [positions[r] for r in np.flatnonzero(~violated).tolist()]
+            for k, row in zip(counted, self.__count([itemsets[k] for k in counted])):
+                rows[k] = row
+        positions = [k for k, row in enumerate(rows) if row >= 0]
+        rows = np.array([rows[k] for k in positions], dtype=np.int64)
+        self.used[rows] = True
+        divergences = self.__divergences(rows)
+        # the divergences of the counts are summed in another order than the ones of the ensemble
+        close = np.flatnonzero(np.abs(divergences - self.threshold) <= DivergenceConstraint.EPSILON)
+        for size in np.unique(self.sizes[rows[close]]).tolist():
+            exact = close[self.sizes[rows[close]] == size]
+            candidates = np.array([self.keys[row] for row in rows[exact].tolist()], dtype=np.int64).reshape(-1, size)
+            divergences[exact] = self.window.compute_sd_batch(candidates)
+            if self.scaled:
+                divergences[exact] /= self.ensemble.compute_combinations(size, 2)
+        self.num_of_evaluated += len(close)
+        passed = divergences <= self.threshold
+        self.num_of_pruned_by_counts += len(rows) - int(passed.sum())
+        self.frontier = rows[passed]
+        satisfied = [False] * len(itemsets)
+        for k in np.flatnonzero(passed).tolist():
+            satisfied[positions[k]] = True
+        return satisfied
+
+    def evict_unused(self):
+        """
+        Forgets the node sets which were not used since the last call
+        :return: None
+        """
+        kept = np.flatnonzero(self.used)
+        new_rows = np.full(len(self.keys), -1, dtype=np.int64)
+        new_rows[kept] = np.arange(len(kept))
+        self.keys = [self.keys[row] for row in kept.tolist()]
+        self.rows = dict(zip(self.keys, range(len(self.keys))))
+        self.sizes = self.sizes[kept]
+        self.salts = self.salts[kept]
+        self.sums = self.sums[kept]
+        self.used = np.zeros(len(kept), dtype=bool)
+        classes = new_rows[self.class_rows] >= 0
+        self.class_keys = self.class_keys[classes]
+        self.class_counts = self.class_counts[classes]
+        self.class_rows = new_rows[self.class_rows[classes]]
+        self.frontier = new_rows[self.frontier]
+        self.frontier = self.frontier[self.frontier >= 0]
+        self.groups = None
+
+    def __count(self, itemsets):
+        """
+        Adds rows for the node sets and counts the timestamps of their induced subgraphs over the distinct static graphs
+        of the window
+        :param itemsets: list of tuples of sorted node ids which have no row
+        :return: list of int - row of every node set
+        """
+        if not itemsets:
+            return []
+        rows = np.arange(len(self.keys), len(self.keys) + len(itemsets))
+        self.keys += itemsets
+        self.rows.update(zip(itemsets, rows.tolist()))
+        sizes = np.array([len(itemset) for itemset in itemsets], dtype=np.int64)
+        self.sizes = np.concatenate((self.sizes, sizes))
+        # the salt of a row is the key of the pair (s, s) for a serial number s, which is not the key of an edge
+        salts = np.arange(self.next_salt, self.next_salt + len(itemsets))
+        self.salts = np.concatenate((self.salts, DynamicNodeSet.pair_keys(salts, salts)))
+        self.next_salt += len(itemsets)
+        self.sums = np.concatenate((self.sums, np.zeros(len(itemsets))))
+        self.used = np.concatenate((self.used, np.ones(len(itemsets), dtype=bool)))
+        self.groups = None
+        indices, multiplicities = self.window.get_unique_snapshots()
+        for size in np.unique(sizes).tolist():
+            group = np.flatnonzero(sizes == size)
+            nodes = np.array([itemsets[k] for k in group.tolist()], dtype=np.int64).reshape(-1, size)
+            first, second, pair_keys = WindowedDivergence.__pairs(nodes)
+            self.__add_columns(rows[group], self.__hashes(first, second, pair_keys, indices), multiplicities)
+        self.num_of_counted += len(itemsets)
+        return rows.tolist()
+
+    def __add_columns(self, rows, hashes, weights):
+        """
+        Adds the timestamps of the columns of hashes to the classes of the subgraphs of the rows
+        :param rows: numpy array of distinct rows
+        :param hashes: 2-D array of uint64 - Zobrist hash of the subgraph of every row (one per line) at every column
+        :param weights: numpy array of int - number of timestamps added by every column, negative to remove them
+        :return: None
+        """
+        if not len(rows) or not hashes.shape[1]:
+            return
+        # the subgraphs of every row are merged before the classes of all the rows are searched
+        order = np.argsort(hashes, axis=1)
+        hashes = np.take_along_axis(hashes, order, axis=1)
+        run_start = np.ones(hashes.shape, dtype=bool)
+        run_start[:, 1:] = hashes[:, 1:] != hashes[:, :-1]
+        cumulative = np.zeros((len(rows), hashes.shape[1] + 1), dtype=np.int64)
+        np.cumsum(np.asarray(weights, dtype=np.int64)[order], axis=1, out=cumulative[:, 1:])
+        line, position = np.nonzero(run_start)
+        run_end = np.append(position[1:], 0)
+        run_end[np.append(line[1:] != line[:-1], True)] = hashes.shape[1]
+        counts = cumulative[line, run_end] - cumulative[line, position]
+        changed = counts != 0
+        self.__add_to_classes(rows[line[changed]], hashes[line, position][changed], counts[changed])
+
+    def __add_to_classes(self, rows, hashes, counts):
+        """
+        Adds timestamps to the classes of the subgraphs with the given hashes, or removes them with negative counts
+
+        The classes left with no timestamps are not deleted.
+        :param rows: numpy array of int - row of the node set of every subgraph
+        :param hashes: numpy array of uint64 - Zobrist hash of every subgraph
+        :param counts: numpy array of int - number of timestamps added to the class of every subgraph
+        :return: None
+        """
+        keys, first, inverse = np.unique(hashes ^ self.salts[rows], return_index=True, return_inverse=True)
+        counts = np.bincount(inverse.ravel(), weights=counts, minlength=len(keys)).astype(np.int64)
+        rows = rows[first]
+        positions = np.searchsorted(self.class_keys, keys)
+        found = positions < len(self.class_keys)
+        found[found] = self.class_keys[positions[found]] == keys[found]
+        old_counts = np.zeros(len(keys), dtype=np.int64)
+        old_counts[found] = self.class_counts[positions[found]]
+        np.add.at(self.sums, rows, WindowedDivergence.__count_log_count(old_counts + counts) -
+                  WindowedDivergence.__count_log_count(old_counts))
+        self.class_counts[positions[found]] += counts[found]
+        new = ~found
+        self.class_keys = np.insert(self.class_keys, positions[new], keys[new])
+        self.class_counts = np.insert(self.class_counts, positions[new], counts[new])
+        self.class_rows = np.insert(self.class_rows, positions[new], rows[new])
+
+    def __divergences(self, rows):
+        """
+        Returns the divergence (scaled or not, like the threshold) of the given rows from their counts
+        :param rows: numpy array of int
+        :return: numpy array of float
+        """
+        sizes = self.sizes[rows]
+        combinations = (sizes * (sizes - 1) // 2).astype(float)
+        num_of_timestamps = self.window.get_num_of_timestamps()
+        divergences = combinations.copy()
+        if num_of_timestamps:
+            # sum(c / T * log2(c / T)) over the classes, computed as in DynamicNodeSet
+            divergences += (self.sums[rows] - popcount(self.nonempty_mask) * math.log2(num_of_timestamps)) / \
+                num_of_timestamps
+        if self.scaled:
+            divergences /= combinations
+        return divergences
+
+    def __entropy_bounds(self, rows=None):
+        """
+        Returns the upper bound on the entropy of the children of the given rows
+        :param rows: numpy array of int, None for all the rows
+        :return: numpy array of float
+        """
+        num_of_timestamps = self.window.get_num_of_timestamps()
+        if not num_of_timestamps:
+            bounds = np.zeros(len(self.keys))
+        else:
+            entropies = (popcount(self.nonempty_mask) * math.log2(num_of_timestamps) - self.sums) / num_of_timestamps
+            # a class of c timestamps is split by a new node into at most min(2^k, c) classes
+            counts = self.class_counts
+            splits = counts * np.minimum(self.sizes[self.class_rows], np.log2(np.maximum(counts, 1)))
+            bounds = entropies + np.bincount(self.class_rows, weights=splits, minlength=len(self.keys)) / \
+                num_of_timestamps
+        return bounds if rows is None else bounds[rows]
+
+    def __violates(self, size, entropy_bound):
+        """
+        Returns true if a node set of the given size whose entropy is at most entropy_bound violates the constraint
+        :param size: int - number of nodes
+        :param entropy_bound: float
+        :return: boolean
+        """
+        combinations = self.ensemble.compute_combinations(size, 2)
+        divergence_bound = combinations - entropy_bound
+        if self.scaled:
+            divergence_bound /= combinations
+        return divergence_bound > self.threshold + DivergenceConstraint.EPSILON
+
+    def __groups(self):
+        """
+        Returns the pairs of the rows of every size
+        :return: list of (numpy array of rows, first and second node ids of their pairs and keys of the pairs, see
+                 __pairs)
+        """
+        if self.groups is None:
+            self.groups = []
+            for size in np.unique(self.sizes).tolist():
+                rows = np.flatnonzero(self.sizes == size)
+                nodes = np.array([self.keys[row] for row in rows.tolist()], dtype=np.int64).reshape(-1, size)
+                self.groups.append((rows,) + WindowedDivergence.__pairs(nodes))
+        return self.groups
+
+    @staticmethod
+    def __pairs(nodes):
+        """
+        Returns the pairs of nodes of every node set with their Zobrist keys
+        :param nodes: 2-D array of int, every row holds the sorted node ids of a node set
+        :return: 2-D arrays of the first and second node id and of the key of every pair, one row per node set
+        """
+        first, second = np.triu_indices(nodes.shape[1], 1)
+        first, second = nodes[:, first], nodes[:, second]
+        return first, second, DynamicNodeSet.pair_keys(first, second)
+
+    def __hashes(self, first, second, pair_keys, columns):
+        """
+        Returns the Zobrist hash of the subgraph induced by every node set at every given timestamp, the XOR of the
+        keys of its pairs with an edge
+
+        The timestamps of the edges of the distinct pairs are read once as bytes from the adjacency of the ensemble,
+        like in Ensemble.compute_sd_batch.
+        :param first: 2-D array of int - first node id of every pair, one row per node set
+        :param second: 2-D array of int - second node id of every pair
+        :param pair_keys: 2-D array of uint64 - key of every pair
+        :param columns: numpy array of int - indices of the timestamps
+        :return: 2-D array of uint64 (node sets x columns)
+        """
+        hashes = np.zeros((len(first), len(columns)), dtype=np.uint64)
+        num_of_pairs = first.shape[1]
+        if not len(first) or not len(columns) or not num_of_pairs:
+            return hashes
+        pairs, inverse = np.unique(first << 32 | second, return_inverse=True)
+        inverse = inverse.reshape(first.shape)
+        # only the bytes from the first to the last column are read
+        low = int(columns.min()) & ~7
+        num_of_bytes = (int(columns.max()) - low) // 8 + 1
+        span_mask = (1 << 8 * num_of_bytes) - 1
+        adj = self.ensemble.adj
+        buffer = b''.join(((adj[pair >> 32].get(pair & 0xffffffff, 0) >> low) & span_mask).to_bytes(num_of_bytes,
+                                                                                                    'little')
+                          for pair in pairs.tolist())
+        bit_rows = np.frombuffer(buffer, dtype=np.uint8).reshape(len(pairs), num_of_bytes)
+        present = ((bit_rows[:, (columns - low) >> 3] >> (columns & 7).astype(np.uint8)) & 1).astype(bool)
+        block_size = max(1, (1 << 20) // (num_of_pairs * len(columns)))
+        for start in range(0, len(first), block_size):
+            stop = min(start + block_size, len(first))
+            hashes[start:stop] = np.bitwise_xor.reduce(np.where(present[inverse[start:stop]],
+                                                                pair_keys[start:stop, :, None], np.uint64(0)), axis=1)
+        return hashes
+
+    @staticmethod
+    def __count_log_count(counts):
+        """
+        Returns count * log2(count) for every count, 0 for count 0, see DynamicNodeSet.count_log_count
+        :param counts: numpy array of int
+        :return: numpy array of float
+        """
+        return counts * np.log2(np.maximum(counts, 1))
@@ -3,6 +3,7 @@ import sys
 import collections
 import itertools
 from Ensemble import Ensemble
+from BitSet import iter_bits
 from EquivalenceClass import EquivalenceClass
 import matplotlib.pyplot as plt
 
@@ -29,8 +30,13 @@ def compute_subgraph_distribution_for_nodes(ensemble, nodes):
     return ordered_subgraphs
 
 def compute_subgraph_freq_distribution_for_nodes(ensemble, nodes):
-    d = compute_subgraph_distribution_for_nodes(ensemble, nodes)
-    return tuple([len(v) for k, v in d.items()])
+    # the q-th bit of a signature is the q-th pair of the sorted node ids
+    ids = sorted(ensemble.get_node_ids(nodes).tolist())
+    pairs = [tuple(sorted(pair)) for pair in itertools.combinations(ensemble.get_node_labels(ids), 2)]
+    found_counts = {}
+    for signature, count in ensemble.count_induced_subgraphs_of_ids(ids).items():
+        found_counts[str(sorted(pairs[q] for q in iter_bits(signature)))] = count
+    return tuple([found_counts.get(k, 0) for k in compute_all_possible_labelled_graphs(nodes)])
 
 
 def test_equivalence_partition(iterable_list, relation = lambda x, y: x == y):
@@ -43,45 +49,38 @@ def test_equivalence_partition(iterable_list, relation = lambda x, y: x == y):
     # for o, c in partitions.items(): print(o, ':', c)
     return classes, partitions
 
-with open('seprox', 'r') as f:
-    T = Ensemble()
-    for line in f:
-        line = line.strip()
-        timestamp, v1, v2 = line.split('\t', 2)
-        if v1 != v2:
-            T.add_edge(timestamp, int(v1), int(v2))
-        else:
-            T.add_node(int(v1))
+if __name__ == '__main__':
+    T = Ensemble.open_tsv('seprox', node_type=int)
 
-nodes_freq_dist_map = collections.OrderedDict()
-ssd_buckets = collections.OrderedDict()
-with open('hyperedge-results/seprox/lam/top-1024-hyperedges.tsv', 'r') as f:
-    for line in f:
-        line = line.strip()
-        nodes = [int(n) for n in line.split('\t')[:-1]]
-        ssd = float(line.split('\t')[-1])
-        if ssd in ssd_buckets:
-            ssd_buckets[ssd].append(nodes)
-        else:
-            ssd_buckets[ssd] = [nodes]
-        dist = compute_subgraph_freq_distribution_for_nodes(T, nodes)
-        if str(dist) in nodes_freq_dist_map:
-            nodes_freq_dist_map[str(dist)].append(nodes)
-        else:
-            nodes_freq_dist_map[str(dist)] = [nodes]
+    nodes_freq_dist_map = collections.OrderedDict()
+    ssd_buckets = collections.OrderedDict()
+    with open('hyperedge-results/seprox/lam/top-1024-hyperedges.tsv', 'r') as f:
+        for line in f:
+            line = line.strip()
+            nodes = [int(n) for n in line.split('\t')[:-1]]
+            ssd = float(line.split('\t')[-1])
+            if ssd in ssd_buckets:
+                ssd_buckets[ssd].append(nodes)
+            else:
+                ssd_buckets[ssd] = [nodes]
+            dist = compute_subgraph_freq_distribution_for_nodes(T, nodes)
+            if str(dist) in nodes_freq_dist_map:
+                nodes_freq_dist_map[str(dist)].append(nodes)
+            else:
+                nodes_freq_dist_map[str(dist)] = [nodes]
 
-# pprint(ssd_buckets)
-pprint(len(nodes_freq_dist_map.keys()))
-for k,v in nodes_freq_dist_map.items():
-    print(str(k) + '\t' + str(v))
-# for tup in tups:
-#     print(tup)
-# classes, partitions = test_equivalence_partition(iter(tups))
-# print(len(classes), len(tups))
-# for c in classes:
-#     print(c)
-# pprint(compute_subgraph_distribution_for_nodes(T, [12, 36, 44, 68]))
-# d = compute_subgraph_distribution_for_nodes(T, [5, 11, 63])
-# pprint(tuple([len(v) for k, v in d.items()]))
-# pprint(T.find_subgraphs_induced_by_nodes([4, 31, 56, 58]))
-# pprint(compute_subgraph_distribution_for_nodes(T, [4, 31, 56, 58]))
\ No newline at end of file
+    # pprint(ssd_buckets)
+    pprint(len(nodes_freq_dist_map.keys()))
+    for k,v in nodes_freq_dist_map.items():
+        print(str(k) + '\t' + str(v))
+    # for tup in tups:
+    #     print(tup)
+    # classes, partitions = test_equivalence_partition(iter(tups))
+    # print(len(classes), len(tups))
+    # for c in classes:
+    #     print(c)
+    # pprint(compute_subgraph_distribution_for_nodes(T, [12, 36, 44, 68]))
+    # d = compute_subgraph_distribution_for_nodes(T, [5, 11, 63])
+    # pprint(tuple([len(v) for k, v in d.items()]))
+    # pprint(T.find_subgraphs_induced_by_nodes([4, 31, 56, 58]))
+    # pprint(compute_subgraph_distribution_for_nodes(T, [4, 31, 56, 58]))
@@ -0,0 +1,137 @@
+import itertools
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from AntiMonotone import AntiMonotone
+from Ensemble import Ensemble
+from LooselyAntiMonotone import LooselyAntiMonotone
+from UCTracker import UCTracker
+
+__author__ = 'adb'
+
+
+def edge_sets(ensemble):
+    """
+    Returns the edge set of the static graph at every timestamp of the ensemble
+    :param ensemble: Ensemble
+    :return: dict {timestamp: set of frozensets of two nodes}
+    """
+    return dict((t, set(frozenset(edge) for edge in ensemble.get_static_graph_at_timestamp(t).edges()))
+                for t in ensemble.get_all_timestamps())
+
+
+class SavedEnsembleTest(unittest.TestCase):
+    """
+    Edges added to an ensemble loaded from its binary copy
+    """
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        rng = np.random.default_rng(1)
+        self.first = (rng.integers(0, 6, 200), rng.integers(0, 20, 200), rng.integers(0, 20, 200))
+        # edges which are already in the saved ensemble, new edges and edges of a node which is not saved
+        self.second = (np.concatenate((self.first[0][:50], rng.integers(0, 8, 100), [3, 7])),
+                       np.concatenate((self.first[1][:50], rng.integers(0, 20, 100), [25, 25])),
+                       np.concatenate((self.first[2][:50], rng.integers(0, 20, 100), [1, 2])))
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_add_edges_from_arrays_after_load(self):
+        expected = Ensemble.from_edge_arrays(*[np.concatenate(columns) for columns in zip(self.first, self.second)])
+        Ensemble.from_edge_arrays(*self.first).save(os.path.join(self.dirname, 'saved'))
+        for mmap_mode in [None, 'r']:
+            ensemble = Ensemble.load(os.path.join(self.dirname, 'saved'), mmap_mode=mmap_mode)
+            ensemble.add_edges_from_arrays(*self.second)
+            self.assertEqual(edge_sets(ensemble), edge_sets(expected))
+            self.assertEqual(ensemble.size(), expected.size())
+            self.assertEqual(ensemble.get_num_of_edges_in_static_graphs(),
+                             expected.get_num_of_edges_in_static_graphs())
+            for nodes in itertools.combinations(range(6), 3):
+                self.assertAlmostEqual(ensemble.compute_scaled_subgraph_divergence(list(nodes)),
+                                       expected.compute_scaled_subgraph_divergence(list(nodes)))
+
+
+class SubgraphCountStoreTest(unittest.TestCase):
+    """
+    Induced subgraph counts shared by two runs on the same ensemble through the persistent store
+    """
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        rng = np.random.default_rng(2)
+        timestamps, first, second = rng.integers(0, 150, 2000), rng.integers(0, 10, 2000), rng.integers(0, 10, 2000)
+        self.edges = (timestamps[first != second], first[first != second], second[first != second])
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_mining_reads_the_stored_counts(self):
+        filename = os.path.join(self.dirname, 'subgraph_counts.sqlite')
+        expected = sorted(Ensemble.from_edge_arrays(*self.edges).maximal_sigma_ssd_ucs(0.5))
+        for run in range(2):
+            ensemble = Ensemble.from_edge_arrays(*self.edges)
+            with ensemble.use_store(filename) as store:
+                self.assertEqual(sorted(ensemble.maximal_sigma_ssd_ucs(0.5)), expected)
+                self.assertEqual(store.get_stats()['hits'] > 0, run == 1)
+
+
+class ProcessPoolTest(unittest.TestCase):
+    """
+    Induced subgraphs counted by the pool of processes of an ensemble and its views
+    """
+
+    def test_views_share_the_pool(self):
+        rng = np.random.default_rng(3)
+        timestamps, first, second = rng.integers(0, 200, 3000), rng.integers(0, 8, 3000), rng.integers(0, 8, 3000)
+        edges = (timestamps[first != second], first[first != second], second[first != second])
+        expected = Ensemble.from_edge_arrays(*edges)
+        ensemble = Ensemble.from_edge_arrays(*edges)
+        view = ensemble.window(0, 100)
+        for nodes in itertools.combinations(range(8), 5):
+            self.assertAlmostEqual(ensemble.compute_subgraph_divergence(nodes, num_of_workers=2),
+                                   expected.compute_subgraph_divergence(nodes))
+            view.compute_subgraph_divergence(nodes, num_of_workers=2)
+        self.assertIsNotNone(ensemble.process_pool)
+        self.assertIs(view.base.process_pool, ensemble.process_pool)
+
+
+class SampledMiningTest(unittest.TestCase):
+    """
+    UCs mined with the candidates screened by sampled estimates of their divergence
+    """
+
+    def test_sampled_ucs_are_exact(self):
+        ensemble = Ensemble.from_tsv(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'datahospital'),
+                                     node_type=int)
+        self.assertEqual(sorted(ensemble.maximal_sigma_ssd_ucs(0.5, num_of_samples=20, seed=1)),
+                         sorted(ensemble.maximal_sigma_ssd_ucs(0.5)))
+
+
+class UCTrackerTest(unittest.TestCase):
+    """
+    UCs of an ensemble to which snapshots are appended
+    """
+
+    def test_append_snapshot(self):
+        data = Ensemble.from_tsv(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sephone'), node_type=int)
+        timestamps = data.get_sorted_timestamps()
+        searches = [(AntiMonotone.generate_candidates, Ensemble.maximal_sigma_ssd_ucs),
+                    (LooselyAntiMonotone.generate_candidates, Ensemble.maximal_lam_sigma_ssd_ucs)]
+        for generate_candidates, mine in searches:
+            ensemble = Ensemble()
+            for node in data.nodes():
+                ensemble.add_node(node)
+            ensemble.append_snapshot(timestamps[0], list(data.get_static_graph_at_timestamp(timestamps[0]).edges()))
+            tracker = UCTracker(ensemble, 0.3, generate_candidates)
+            for timestamp in timestamps[1:]:
+                tracker.append_snapshot(timestamp, list(data.get_static_graph_at_timestamp(timestamp).edges()))
+                self.assertEqual(tracker.get_ucs(), sorted(tuple(sorted(uc)) for uc in mine(ensemble, 0.3)))
+
+
+if __name__ == '__main__':
+    unittest.main()